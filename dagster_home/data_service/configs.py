@@ -10,5 +10,9 @@ class Configs(BaseSettings):
     # PIPELINE RUN_TIME
     INGEST_DATA_RUNTIME: str = "00 23 * * *"
     MODEL_TRAINING_RUNTIME: str = "0 0 1 * *"
+    DECAYED_MODEL_TRAINING_RUNTIME: str = "0 2 * * *"
+
+    # Half-life in days of the decayed training counts
+    MODEL_TRAINING_HALF_LIFE_DAYS: float = 14.0
 
 configs = Configs()
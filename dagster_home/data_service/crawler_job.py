@@ -7,7 +7,7 @@ from loguru import logger
 from dagster_home.data_service.utils.common import request_riot_api
 from dagster_home.data_service.configs import configs
 from settings import settings
-from dagster_home.data_service.utils.db_operator import S3Operator
+from dagster_home.data_service.utils.db_operator import shared_s3_operator
 import requests
 
 def retry_request(func, max_retries=5, backoff=5, **kwargs):
@@ -36,7 +36,7 @@ def retry_request(func, max_retries=5, backoff=5, **kwargs):
 class RiotAPIClient:
     def __init__(self, regions: list[str]):
         self.regions = regions
-        self.s3_operator = S3Operator(
+        self.s3_operator = shared_s3_operator(
             endpoint=settings.S3_ENDPOINT,
             access_key=settings.S3_ACCESS_KEY,
             secret_key=settings.S3_SECRET_KEY,
@@ -127,7 +127,7 @@ class RiotAPIClient:
     def process_match_data(self, match_data: Dict):
         match_id = match_data.get('metadata', {}).get('matchId', 'unknown')
         key = f"raw/matches/{match_id}.json"
-        if self.s3_operator.upload_json(key=key, data=match_data):
+        if self.s3_operator.upload_json(key=key, data=match_data, compression=settings.S3_COMPRESSION):
             logger.info(f"Saved match {match_id}")
         else:
             logger.error(f"Failed to save match {match_id}")
@@ -1,5 +1,6 @@
 from dagster_home.data_service.ops.api_ops import fetch_champion_roles
 from dagster_home.data_service.ops.sync_table_trino import sync_trino_partitions
+from dagster_home.data_service.ops.serving_ops import refresh_serving_champions_op
 from dagster import job
 
 @job
@@ -8,4 +9,5 @@ def champion_crawler_job():
     API crawler job to fetch and process champion data.
     """
     champion_table_info = fetch_champion_roles()
-    sync_trino_partitions(champion_table_info)
+    synced = sync_trino_partitions(champion_table_info)
+    refresh_serving_champions_op(synced)
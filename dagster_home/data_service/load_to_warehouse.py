@@ -1,6 +1,6 @@
 from datetime import datetime
 import pandas as pd
-from dagster_home.data_service.utils.db_operator import S3Operator
+from dagster_home.data_service.utils.db_operator import shared_s3_operator
 from loguru import logger
 from settings import settings
 from io import StringIO
@@ -14,7 +14,7 @@ class MatchDataWarehouseLoaderS3:
         # Debug: Show what bucket we're using
         logger.info(f"Initializing with bucket: {settings.S3_DATA_BUCKET}")
 
-        self.s3_operator = S3Operator(
+        self.s3_operator = shared_s3_operator(
             endpoint=settings.S3_ENDPOINT,
             access_key=settings.S3_ACCESS_KEY,
             secret_key=settings.S3_SECRET_KEY,
@@ -44,19 +44,6 @@ class MatchDataWarehouseLoaderS3:
             logger.error(traceback.format_exc())
             return []
 
-    def read_match_json(self, key: str) -> dict:
-        """Read a single match JSON from S3"""
-        try:
-            data = self.s3_operator.download_json(key)
-            if not data:
-                logger.warning(f"Empty data for {key}")
-                return None
-            logger.debug(f"Successfully read {key}")
-            return data
-        except Exception as e:
-            logger.error(f"Failed to read {key}: {e}")
-            return None
-
     def transform_match(self, match_data: dict) -> pd.DataFrame:
         """Transform raw match JSON into DataFrame with timestamp - RANKED SOLO 5v5 ONLY"""
         if not match_data:
@@ -120,6 +107,16 @@ class MatchDataWarehouseLoaderS3:
             logger.error(traceback.format_exc())
             return pd.DataFrame()
 
+    def partition_key(self, game_date: str) -> str:
+        return f"{self.warehouse_prefix}date={game_date}/matches.csv"
+
+    def partition_csvs(self, final_df: pd.DataFrame):
+        """Yield (key, CSV bytes) per game_date partition, built lazily as uploads free up"""
+        for game_date, df_partition in final_df.groupby("game_date"):
+            csv_buffer = StringIO()
+            df_partition.to_csv(csv_buffer, index=False)
+            yield self.partition_key(game_date), csv_buffer.getvalue().encode('utf-8')
+
     def run(self):
         """Full pipeline: list → read → transform → concat → deduplicate → save partitioned by date"""
         logger.info("Starting warehouse load process...")
@@ -132,13 +129,18 @@ class MatchDataWarehouseLoaderS3:
         logger.info(f"Processing {len(files)} match files...")
 
         all_dfs = []
-        for idx, key in enumerate(files, 1):
-            logger.info(f"Processing file {idx}/{len(files)}: {key}")
-            match_json = self.read_match_json(key)
-            if not match_json:
+        # Downloads run concurrently; matches are transformed as they arrive
+        for idx, result in enumerate(self.s3_operator.download_many(files), 1):
+            if idx % 1000 == 0 or idx == len(files):
+                logger.info(f"Processed {idx}/{len(files)} match files")
+            if not result.ok:
+                logger.error(f"Failed to read {result.key}: {result.error}")
+                continue
+            if not result.data:
+                logger.warning(f"Empty data for {result.key}")
                 continue
 
-            df = self.transform_match(match_json)
+            df = self.transform_match(result.data)
             if not df.empty:
                 all_dfs.append(df)
 
@@ -158,30 +160,15 @@ class MatchDataWarehouseLoaderS3:
         final_df = final_df.sort_values("game_start")
         final_df["game_date"] = final_df["game_start"].dt.strftime("%Y-%m-%d")
 
-        for game_date, df_partition in final_df.groupby("game_date"):
-            logger.info(f"Saving partition for date {game_date} ({len(df_partition)} records)...")
-
-            try:
-                csv_buffer = StringIO()
-                df_partition.to_csv(csv_buffer, index=False)
-                csv_content = csv_buffer.getvalue()
-
-                key = f"{self.warehouse_prefix}date={game_date}/matches.csv"
-                logger.info(f"Uploading to {key} (size: {len(csv_content)} bytes)")
-
-                success = self.s3_operator.upload_fileobj(
-                    key=key,
-                    fileobj=csv_content.encode('utf-8')
-                )
-
-                if success:
-                    logger.info(f"Saved {len(df_partition)} matches for {game_date} to S3: {key}")
-                else:
-                    logger.error(f"Failed to save matches for {game_date} to S3: {key}")
-
-            except Exception as e:
-                logger.error(f"Exception saving partition {game_date}: {e}")
-                import traceback
-                logger.error(traceback.format_exc())
+        partitions = {
+            self.partition_key(game_date): (game_date, len(df_partition))
+            for game_date, df_partition in final_df.groupby("game_date")
+        }
+        for result in self.s3_operator.upload_many(self.partition_csvs(final_df), content_type='text/csv'):
+            game_date, num_matches = partitions[result.key]
+            if result.ok:
+                logger.info(f"Saved {num_matches} matches for {game_date} to S3: {result.key} ({result.data} bytes)")
+            else:
+                logger.error(f"Failed to save matches for {game_date} to S3: {result.key}: {result.error}")
 
         logger.info("Warehouse load process completed!")
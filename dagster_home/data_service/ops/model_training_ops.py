@@ -10,6 +10,11 @@ class TrainingOpConfig(Config):
     training_end_date: Optional[str] = None
     experiment_name: str = "champion_recommender"
     register_as_production: bool = True
+    use_count_cube: bool = True
+    half_life_days: Optional[float] = None
+    min_games: int = 0
+    num_workers: Optional[int] = None
+    validation_ratio: float = 0.2
 
 @op
 def training_model_op(context, config: TrainingOpConfig):
@@ -22,7 +27,12 @@ def training_model_op(context, config: TrainingOpConfig):
         "training_start_date": config.training_start_date,
         "training_end_date": config.training_end_date,
         "experiment_name": config.experiment_name,
-        "register_as_production": config.register_as_production
+        "register_as_production": config.register_as_production,
+        "use_count_cube": config.use_count_cube,
+        "half_life_days": config.half_life_days,
+        "min_games": config.min_games,
+        "num_workers": config.num_workers,
+        "validation_ratio": config.validation_ratio
     }
 
     context.log.info(f"Triggering training with payload: {payload}")
@@ -0,0 +1,21 @@
+from dagster import op, In
+import requests
+from settings import settings
+
+
+@op(ins={"synced": In(bool)}, description="Refresh the serving API's in-memory champion roles and icons")
+def refresh_serving_champions_op(context, synced: bool):
+    """Ask the model API to reload the champion table it filters recommendations with"""
+    fastapi_url = f"{settings.FASTAPI_HOST}/champions/refresh"
+    context.log.info(f"Refreshing champion metadata via {fastapi_url} (partitions synced: {synced})")
+
+    try:
+        response = requests.post(fastapi_url, timeout=30)
+        response.raise_for_status()
+        result = response.json()
+        context.log.info(f"Serving API now holds {result.get('num_champions')} champions")
+        return result
+    except requests.exceptions.RequestException as e:
+        # The serving TTL refresh still picks the new table up later
+        context.log.warning(f"Champion metadata refresh failed: {str(e)}")
+        return None
@@ -4,7 +4,7 @@ from dagster_home.data_service.jobs.load_data_to_warehouse import load_data_to_w
 from dagster_home.data_service.jobs.champion_crawler import champion_crawler_job
 from dagster_home.data_service.jobs.training_job import trigger_training_job
 from dagster_home.data_service.sensors import trigger_warehouse_after_api_crawler
-from dagster_home.data_service.schedule import daily_match_crawler_schedule, monthly_model_training_schedule, daily_champion_crawler_schedule
+from dagster_home.data_service.schedule import daily_match_crawler_schedule, monthly_model_training_schedule, daily_decayed_model_training_schedule, daily_champion_crawler_schedule
 
 @repository
 def data_service_repository():
@@ -18,6 +18,7 @@ def data_service_repository():
         # Schedules
         daily_match_crawler_schedule,
         monthly_model_training_schedule,
+        daily_decayed_model_training_schedule,
         daily_champion_crawler_schedule,
         # Sensors
         trigger_warehouse_after_api_crawler,
@@ -1,5 +1,5 @@
 from dagster_home.data_service.jobs.training_job import trigger_training_job
-from dagster import schedule
+from dagster import schedule, DefaultScheduleStatus
 from dagster_home.data_service.configs import configs
 from datetime import datetime, timedelta
 @schedule(
@@ -20,3 +20,27 @@ def monthly_model_training_schedule(context):
             },
         }
     }
+
+
+@schedule(
+    job=trigger_training_job,
+    cron_schedule=configs.DECAYED_MODEL_TRAINING_RUNTIME,
+    execution_timezone="Asia/Bangkok",
+    default_status=DefaultScheduleStatus.STOPPED  # Alternative to the monthly window, enable only one
+)
+def daily_decayed_model_training_schedule(context):
+    # Only the newest partitions are scanned once the decayed counts exist;
+    # the start date just bootstraps them on the first run.
+    return {
+        "ops": {
+            "training_model_op": {
+                "config": {
+                    "training_start_date": (datetime.now() - timedelta(days=90)).strftime("%Y-%m-%d"),
+                    "training_end_date": datetime.now().strftime("%Y-%m-%d"),
+                    "experiment_name": "champion_recommender",
+                    "register_as_production": True,
+                    "half_life_days": configs.MODEL_TRAINING_HALF_LIFE_DAYS
+                }
+            },
+        }
+    }
@@ -1,15 +1,96 @@
 import json
 import logging
 from datetime import datetime
-from typing import Dict, List, Optional, Any
+from typing import Any, BinaryIO, Callable, Dict, Iterable, Iterator, List, NamedTuple, Optional, Tuple, Union
 from minio import Minio
 from minio.error import S3Error
+from contextlib import contextmanager
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
 from io import BytesIO
+import gzip
+import itertools
+import mmap
+import os
+import threading
+import certifi
 import urllib3
+from settings import settings
+
+try:
+    import zstandard
+except ImportError:  # zstd is optional; gzip is always available
+    zstandard = None
 
 # Disable SSL warnings for local development
 urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
 
+
+# Object metadata entry (x-amz-meta-content-codec) naming the codec a body was compressed with.
+# Content-Encoding is deliberately not used: HTTP clients would decode it on their own.
+CODEC_METADATA_KEY = "content-codec"
+CODECS = ("gzip", "zstd")
+
+
+def encode_body(data: bytes, codec: Optional[str]) -> bytes:
+    """Compress an object body with codec ('gzip', 'zstd'; None or '' leaves it as is)"""
+    if not codec:
+        return data
+    if codec == "gzip":
+        return gzip.compress(data, compresslevel=6, mtime=0)
+    if codec == "zstd":
+        if zstandard is None:
+            raise ValueError("zstd compression needs the zstandard package")
+        return zstandard.ZstdCompressor(level=3).compress(data)
+    raise ValueError(f"Unknown compression codec {codec}, expected one of {CODECS}")
+
+
+def decode_body(data: bytes, codec: Optional[str]) -> bytes:
+    """Undo encode_body"""
+    if not codec:
+        return data
+    if codec == "gzip":
+        return gzip.decompress(data)
+    if codec == "zstd":
+        if zstandard is None:
+            raise ValueError("zstd decompression needs the zstandard package")
+        return zstandard.ZstdDecompressor().decompress(data)
+    raise ValueError(f"Unknown compression codec {codec}, expected one of {CODECS}")
+
+
+MiB = 1024 * 1024
+# Restarts of a ranged download whose object was overwritten between its ranges
+RANGE_DOWNLOAD_ATTEMPTS = 3
+
+
+def _read_into(response, view: memoryview):
+    """Fill view from an HTTP response without intermediate copies"""
+    filled = 0
+    while filled < len(view):
+        read = response.readinto(view[filled:])
+        if not read:
+            raise IOError(f"Connection closed after {filled} of {len(view)} bytes")
+        filled += read
+
+
+def _object_size(response) -> int:
+    """Total object size from a ranged GET response (Content-Range: bytes 0-N/TOTAL)"""
+    content_range = response.headers.get("Content-Range")
+    if content_range:
+        return int(content_range.rsplit("/", 1)[1])
+    return int(response.headers["Content-Length"])
+
+
+class TransferResult(NamedTuple):
+    """Outcome of one object in a bulk transfer"""
+    key: str
+    data: Any = None
+    error: Optional[str] = None
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+
 class S3Operator:
     def __init__(
         self,
@@ -18,11 +99,15 @@ class S3Operator:
         secret_key: str,
         bucket_name: str,
         secure: bool = False,
-        region: str = "us-east-1"
+        region: str = "us-east-1",
+        http_client: Optional[urllib3.PoolManager] = None
     ):
         """
         Initialize MinIO S3 client
 
+        Prefer shared_s3_operator(), which reuses one operator per endpoint and
+        bucket and one connection pool per process.
+
         Args:
             endpoint: MinIO server endpoint (e.g., 'localhost:9000')
             access_key: MinIO access key
@@ -30,25 +115,36 @@ class S3Operator:
             bucket_name: Default bucket name
             secure: Use HTTPS (False for local development)
             region: AWS region (for compatibility)
+            http_client: Connection pool to send requests through (MinIO creates its own when None)
         """
-        self.client = Minio(
+        self._client = Minio(
             endpoint=endpoint,
             access_key=access_key,
             secret_key=secret_key,
             secure=secure,
-            region=region
+            region=region,
+            http_client=http_client
         )
         self.bucket_name = bucket_name
         self.logger = logging.getLogger(__name__)
-
-        # Ensure bucket exists
-        self._ensure_bucket_exists()
+        self._bucket_checked = False
+        self._bucket_lock = threading.Lock()
+
+    @property
+    def client(self) -> Minio:
+        """MinIO client; the bucket is checked (and created) once, on first use"""
+        if not self._bucket_checked:
+            with self._bucket_lock:
+                if not self._bucket_checked:
+                    self._ensure_bucket_exists()
+                    self._bucket_checked = True
+        return self._client
 
     def _ensure_bucket_exists(self):
         """Create bucket if it doesn't exist"""
         try:
-            if not self.client.bucket_exists(self.bucket_name):
-                self.client.make_bucket(self.bucket_name)
+            if not self._client.bucket_exists(self.bucket_name):
+                self._client.make_bucket(self.bucket_name)
                 self.logger.info(f"Created bucket: {self.bucket_name}")
             else:
                 self.logger.info(f"Bucket {self.bucket_name} already exists")
@@ -56,7 +152,8 @@ class S3Operator:
             self.logger.error(f"Failed to create/check bucket {self.bucket_name}: {e}")
             raise
 
-    def upload_json(self, key: str, data: Dict, metadata: Optional[Dict] = None) -> bool:
+    def upload_json(self, key: str, data: Dict, metadata: Optional[Dict] = None,
+                    compression: Optional[str] = None) -> bool:
         """
         Upload JSON data to MinIO
 
@@ -64,26 +161,15 @@ class S3Operator:
             key: Object key/path in bucket
             data: Dictionary to upload as JSON
             metadata: Optional metadata tags
+            compression: Codec ('gzip' or 'zstd') to store the body with; download_json
+                decompresses it. Leave None for objects other readers (Trino) scan
 
         Returns:
             bool: Success status
         """
         try:
-            json_data = json.dumps(data, ensure_ascii=False)
-            json_bytes = json_data.encode('utf-8')
-
-            # Create BytesIO object
-            data_stream = BytesIO(json_bytes)
-
-            # Upload to MinIO
-            self.client.put_object(
-                bucket_name=self.bucket_name,
-                object_name=key,
-                data=data_stream,
-                length=len(json_bytes),
-                content_type='application/json',
-                metadata=metadata or {}
-            )
+            json_bytes = json.dumps(data, ensure_ascii=False).encode('utf-8')
+            self._put_bytes(key, json_bytes, 'application/json', metadata, compression)
 
             self.logger.info(f"Successfully uploaded {key} to {self.bucket_name}")
             return True
@@ -97,7 +183,7 @@ class S3Operator:
 
     def download_json(self, key: str) -> Optional[Dict]:
         """
-        Download JSON data from MinIO
+        Download JSON data from MinIO, decompressing it when it was uploaded compressed
 
         Args:
             key: Object key/path in bucket
@@ -106,8 +192,7 @@ class S3Operator:
             Dict: Downloaded JSON data or None if failed
         """
         try:
-            response = self.client.get_object(self.bucket_name, key)
-            json_data = response.read().decode('utf-8')
+            json_data = self._get_bytes(key).decode('utf-8')
 
             self.logger.info(f"Successfully downloaded {key} from {self.bucket_name}")
             return json.loads(json_data)
@@ -121,10 +206,6 @@ class S3Operator:
         except Exception as e:
             self.logger.error(f"Unexpected error downloading {key}: {e}")
             return None
-        finally:
-            if 'response' in locals():
-                response.close()
-                response.release_conn()
 
     def upload_file(self, key: str, file_path: str, content_type: str = None) -> bool:
         """
@@ -143,7 +224,9 @@ class S3Operator:
                 bucket_name=self.bucket_name,
                 object_name=key,
                 file_path=file_path,
-                content_type=content_type
+                content_type=content_type,
+                part_size=settings.S3_PART_SIZE_MB * MiB,
+                num_parallel_uploads=settings.S3_PART_WORKERS
             )
 
             self.logger.info(f"Successfully uploaded file {file_path} as {key}")
@@ -155,7 +238,7 @@ class S3Operator:
 
     def download_file(self, key: str, file_path: str) -> bool:
         """
-        Download file from MinIO
+        Download file from MinIO with parallel ranged GETs (see download_into)
 
         Args:
             key: Object key/path in bucket
@@ -165,11 +248,7 @@ class S3Operator:
             bool: Success status
         """
         try:
-            self.client.fget_object(
-                bucket_name=self.bucket_name,
-                object_name=key,
-                file_path=file_path
-            )
+            self.download_into(key, file_path)
 
             self.logger.info(f"Successfully downloaded {key} to {file_path}")
             return True
@@ -177,6 +256,9 @@ class S3Operator:
         except S3Error as e:
             self.logger.error(f"Failed to download {key}: {e}")
             return False
+        except Exception as e:
+            self.logger.error(f"Unexpected error downloading {key}: {e}")
+            return False
 
     def list_objects(self, prefix: str = "", recursive: bool = False) -> List[str]:
         """
@@ -285,20 +367,331 @@ class S3Operator:
             self.logger.error(f"Failed to create presigned URL for {key}: {e}")
             return None
 
-    def upload_fileobj(self, key: str, fileobj: bytes, metadata: Optional[Dict] = None) -> bool:
+    def upload_fileobj(self, key: str, fileobj: bytes, metadata: Optional[Dict] = None,
+                       compression: Optional[str] = None) -> bool:
         try:
-            from io import BytesIO
-            stream = BytesIO(fileobj)
-            self.client.put_object(
-                bucket_name=self.bucket_name,
-                object_name=key,
-                data=stream,
-                length=len(fileobj),
-                content_type='text/csv',
-                metadata=metadata or {}
-            )
+            self._put_bytes(key, fileobj, 'text/csv', metadata, compression)
             self.logger.info(f"Uploaded {key} to {self.bucket_name}")
             return True
         except Exception as e:
             self.logger.error(f"Failed to upload {key}: {e}")
             return False
+
+    def _get_bytes(self, key: str) -> bytes:
+        """Object content, decompressed according to its codec metadata; raises on failure"""
+        response = self.client.get_object(self.bucket_name, key)
+        try:
+            data = response.read()
+            codec = response.headers.get(f"x-amz-meta-{CODEC_METADATA_KEY}")
+        finally:
+            response.close()
+            response.release_conn()
+        return decode_body(data, codec)
+
+    def _put_bytes(self, key: str, data: bytes, content_type: str, metadata: Optional[Dict] = None,
+                   compression: Optional[str] = None, max_workers: Optional[int] = None):
+        """
+        Store data under key, compressed with the compression codec if given; raises on failure
+
+        max_workers caps the parts sent concurrently (settings.S3_PART_WORKERS if None).
+        """
+        metadata = dict(metadata or {})
+        if compression:
+            data = encode_body(data, compression)
+            metadata[CODEC_METADATA_KEY] = compression
+        # Payloads over one part go up as a parallel multipart upload
+        self._put_stream(key, BytesIO(data), len(data), content_type, metadata, max_workers=max_workers)
+
+    def upload_large(self, key: str, source: Union[str, BinaryIO], length: int = -1,
+                     content_type: str = 'application/octet-stream', metadata: Optional[Dict] = None,
+                     part_size: Optional[int] = None, max_workers: Optional[int] = None) -> bool:
+        """
+        Multipart upload from a file or stream, sending parts in parallel
+
+        Only part_size x max_workers bytes are buffered at a time, so the
+        payload never has to be held in memory.
+
+        Args:
+            key: Object key/path in bucket
+            source: Local file path, or a readable binary stream
+            length: Stream length in bytes (-1 if unknown; ignored for a path)
+            content_type: MIME type
+            metadata: Optional metadata tags
+            part_size: Bytes per part, at least 5 MiB (settings.S3_PART_SIZE_MB if None)
+            max_workers: Parts uploaded concurrently (settings.S3_PART_WORKERS if None)
+
+        Returns:
+            bool: Success status
+        """
+        try:
+            if isinstance(source, str):
+                with open(source, "rb") as f:
+                    self._put_stream(key, f, os.fstat(f.fileno()).st_size, content_type, metadata,
+                                     part_size, max_workers)
+            else:
+                self._put_stream(key, source, length, content_type, metadata, part_size, max_workers)
+            self.logger.info(f"Successfully uploaded {key} to {self.bucket_name}")
+            return True
+        except Exception as e:
+            self.logger.error(f"Failed to upload {key}: {e}")
+            return False
+
+    def _put_stream(self, key: str, stream: BinaryIO, length: int, content_type: str,
+                    metadata: Optional[Dict] = None, part_size: Optional[int] = None,
+                    max_workers: Optional[int] = None):
+        """put_object in parts of part_size sent on max_workers threads; single request when it fits one part"""
+        self.client.put_object(
+            bucket_name=self.bucket_name,
+            object_name=key,
+            data=stream,
+            length=length,
+            content_type=content_type,
+            metadata=metadata or {},
+            part_size=part_size or settings.S3_PART_SIZE_MB * MiB,
+            num_parallel_uploads=max_workers or settings.S3_PART_WORKERS
+        )
+
+    def download_into(self, key: str, destination: Union[str, bytearray, memoryview, None] = None,
+                      part_size: Optional[int] = None, max_workers: Optional[int] = None):
+        """
+        Download an object with parallel ranged GETs straight into a buffer or file
+
+        Each range is read directly into its slice of the destination (a file
+        is memory-mapped), so the object is never assembled in a temporary
+        buffer. The stored bytes are written as is, compressed or not.
+
+        Args:
+            key: Object key/path in bucket
+            destination: File path to (over)write once the whole object arrived, a writable
+                buffer of exactly the object's size, or None to allocate a bytearray
+            part_size: Bytes per ranged GET (settings.S3_PART_SIZE_MB if None)
+            max_workers: Ranges downloaded concurrently (settings.S3_PART_WORKERS if None)
+
+        Returns:
+            The destination path or buffer; raises on failure
+        """
+        return self._download_ranges(key, destination, part_size, max_workers)[0]
+
+    def _download_ranges(self, key: str, destination: Union[str, bytearray, memoryview, None],
+                         part_size: Optional[int], max_workers: Optional[int]):
+        """download_into, also returning the object's codec metadata and ETag"""
+        for attempt in range(1, RANGE_DOWNLOAD_ATTEMPTS + 1):
+            try:
+                return self._download_ranges_once(key, destination, part_size, max_workers)
+            except S3Error as e:
+                if e.code != "PreconditionFailed" or attempt == RANGE_DOWNLOAD_ATTEMPTS:
+                    raise
+                self.logger.warning(f"{key} was overwritten during a ranged download, restarting it")
+
+    def _download_ranges_once(self, key: str, destination: Union[str, bytearray, memoryview, None],
+                              part_size: Optional[int], max_workers: Optional[int]):
+        part_size = part_size or settings.S3_PART_SIZE_MB * MiB
+        # The first range also tells the object size, so small objects take a single request
+        try:
+            first = self.client.get_object(self.bucket_name, key, offset=0, length=part_size)
+        except S3Error as e:
+            if e.code != "InvalidRange":
+                raise
+            first = None  # empty object
+        try:
+            size = _object_size(first) if first is not None else 0
+            codec = first.headers.get(f"x-amz-meta-{CODEC_METADATA_KEY}") if first is not None else None
+            # Later ranges must come from the same object version as the first one
+            etag = first.headers.get("ETag") if first is not None else None
+            with self._open_destination(destination, size) as (result, view):
+                if first is not None:
+                    _read_into(first, view[:min(part_size, size)])
+                    first.close()
+                    first.release_conn()
+                    first = None
+                ranges = [(offset, min(part_size, size - offset)) for offset in range(part_size, size, part_size)]
+                if ranges:
+                    with ThreadPoolExecutor(max_workers=max_workers or settings.S3_PART_WORKERS,
+                                            thread_name_prefix="s3-range") as executor:
+                        for future in [executor.submit(self._get_range, key, view, *r, etag) for r in ranges]:
+                            future.result()
+        finally:
+            if first is not None:
+                first.close()
+                first.release_conn()
+        return result, codec, etag.strip('"') if etag else None
+
+    def _get_range(self, key: str, view: memoryview, offset: int, length: int, etag: Optional[str]):
+        """Read one range into view; raises S3Error PreconditionFailed once the object no longer has etag"""
+        headers = {"If-Match": etag} if etag else None
+        response = self.client.get_object(self.bucket_name, key, offset=offset, length=length,
+                                          request_headers=headers)
+        try:
+            _read_into(response, view[offset:offset + length])
+        finally:
+            response.close()
+            response.release_conn()
+
+    @contextmanager
+    def _open_destination(self, destination, size: int):
+        """Yield (result, writable memoryview of size bytes) for a download_into destination"""
+        if destination is None:
+            buffer = bytearray(size)
+            yield buffer, memoryview(buffer)
+        elif isinstance(destination, str):
+            # Ranges land in a .part file that replaces the destination only once complete,
+            # so a failed download leaves an existing file untouched
+            partial = f"{destination}.part"
+            try:
+                with open(partial, "w+b") as f:
+                    f.truncate(size)
+                    if size == 0:
+                        yield destination, memoryview(b"")
+                    else:
+                        mapped = mmap.mmap(f.fileno(), size)
+                        view = memoryview(mapped)
+                        try:
+                            yield destination, view
+                            mapped.flush()
+                        finally:
+                            view.release()
+                            mapped.close()
+                os.replace(partial, destination)
+            except BaseException:
+                try:
+                    os.unlink(partial)
+                except FileNotFoundError:
+                    pass
+                raise
+        else:
+            view = memoryview(destination).cast("B")
+            if len(view) != size:
+                raise ValueError(f"Destination holds {len(view)} bytes, object {size}")
+            yield destination, view
+
+    def download_many(self, keys: Iterable[str], as_json: bool = True,
+                      max_workers: Optional[int] = None) -> Iterator[TransferResult]:
+        """
+        Download many objects concurrently
+
+        Args:
+            keys: Object keys/paths in bucket; consumed lazily
+            as_json: Parse each object as JSON (raw bytes otherwise)
+            max_workers: Concurrent requests (settings.S3_TRANSFER_WORKERS if None)
+
+        Returns:
+            Iterator[TransferResult]: One result per key in completion order;
+                a failed object has data None and the error message
+        """
+        def download(key: str):
+            data = self._get_bytes(key)
+            return json.loads(data) if as_json else data
+
+        return self._run_many(download, ((key, (key,)) for key in keys), max_workers)
+
+    def upload_many(self, objects: Iterable[Tuple[str, bytes]], content_type: str = 'application/octet-stream',
+                    metadata: Optional[Dict] = None, max_workers: Optional[int] = None,
+                    compression: Optional[str] = None) -> Iterator[TransferResult]:
+        """
+        Upload many objects concurrently
+
+        Args:
+            objects: (key, content) pairs; consumed lazily
+            content_type: MIME type of every object
+            metadata: Optional metadata tags of every object
+            max_workers: Concurrent requests (settings.S3_TRANSFER_WORKERS if None)
+            compression: Codec ('gzip' or 'zstd') to store every object with
+
+        Returns:
+            Iterator[TransferResult]: One result per object in completion order
+        """
+        def upload(key: str, data: bytes):
+            # One part at a time: the objects already run in parallel, and parts on top
+            # would need S3_TRANSFER_WORKERS x S3_PART_WORKERS pooled connections
+            self._put_bytes(key, data, content_type, metadata, compression, max_workers=1)
+            return len(data)
+
+        return self._run_many(upload, ((key, (key, data)) for key, data in objects), max_workers)
+
+    def _run_many(self, func: Callable, jobs: Iterable[Tuple[str, tuple]],
+                  max_workers: Optional[int]) -> Iterator[TransferResult]:
+        """Run func(*args) for every (key, args) job on a bounded pool, yielding results as they finish"""
+        max_workers = max_workers or settings.S3_TRANSFER_WORKERS
+        jobs = iter(jobs)
+        succeeded = failed = 0
+        with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="s3-transfer") as executor:
+            pending = {}
+            while True:
+                # Keep a bounded number of jobs queued so huge key lists are never materialized
+                for key, args in itertools.islice(jobs, 2 * max_workers - len(pending)):
+                    pending[executor.submit(func, *args)] = key
+                if not pending:
+                    break
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    key = pending.pop(future)
+                    try:
+                        result = TransferResult(key=key, data=future.result())
+                        succeeded += 1
+                    except Exception as e:
+                        self.logger.error(f"Failed to transfer {key}: {e}")
+                        result = TransferResult(key=key, error=str(e))
+                        failed += 1
+                    yield result
+        self.logger.info(f"Transferred {succeeded} objects ({failed} failed) with {self.bucket_name}")
+
+
+_http_client: Optional[urllib3.PoolManager] = None
+_operators: Dict[tuple, S3Operator] = {}
+_factory_lock = threading.Lock()
+
+
+def shared_http_client() -> urllib3.PoolManager:
+    """Process-wide keep-alive connection pool for every S3Operator"""
+    global _http_client
+    with _factory_lock:
+        if _http_client is None:
+            _http_client = urllib3.PoolManager(
+                num_pools=settings.S3_HTTP_NUM_POOLS,
+                maxsize=settings.S3_HTTP_POOL_SIZE,
+                block=False,
+                timeout=urllib3.Timeout(connect=settings.S3_CONNECT_TIMEOUT_SECONDS,
+                                        read=settings.S3_READ_TIMEOUT_SECONDS),
+                retries=urllib3.Retry(total=5, backoff_factor=0.2, status_forcelist=[500, 502, 503, 504]),
+                cert_reqs="CERT_REQUIRED",
+                ca_certs=os.environ.get("SSL_CERT_FILE") or certifi.where()
+            )
+        return _http_client
+
+
+def shared_s3_operator(
+    endpoint: str,
+    access_key: str,
+    secret_key: str,
+    bucket_name: str,
+    secure: bool = False,
+    region: str = "us-east-1"
+) -> S3Operator:
+    """
+    Get the process-wide S3Operator for an endpoint and bucket, creating it on first use.
+
+    Operators are cached per (endpoint, credentials, bucket, secure, region) and
+    all share one connection pool, so constructing one per request or job
+    costs neither a new pool nor a bucket round trip.
+
+    Returns:
+        S3Operator: Cached operator
+    """
+    key = (endpoint, access_key, secret_key, bucket_name, secure, region)
+    operator = _operators.get(key)
+    if operator is None:
+        http_client = shared_http_client()
+        with _factory_lock:
+            operator = _operators.get(key)
+            if operator is None:
+                operator = S3Operator(
+                    endpoint=endpoint,
+                    access_key=access_key,
+                    secret_key=secret_key,
+                    bucket_name=bucket_name,
+                    secure=secure,
+                    region=region,
+                    http_client=http_client
+                )
+                _operators[key] = operator
+    return operator
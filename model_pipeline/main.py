@@ -1,15 +1,24 @@
-from fastapi import FastAPI, BackgroundTasks, HTTPException
+from fastapi import FastAPI, HTTPException
+from contextlib import asynccontextmanager
+from concurrent.futures import ThreadPoolExecutor
 from pydantic import BaseModel
-from typing import Optional
+from typing import Callable, Optional
 from datetime import datetime, timedelta
 from model_pipeline.training.pipeline import TrainingPipeline
-from model_pipeline.serving.predictor import ServingPipeline
+from model_pipeline.training.executor import TrainingExecutor, TrainingQueueFull
+from model_pipeline.serving.predictor import BatchServingPipeline, ServingPipeline, TeamCompletionPipeline
+from model_pipeline.serving.actors.model_registry import model_registry
+from model_pipeline.serving.actors.champion_metadata import champion_metadata_index
+from model_pipeline.serving.actors.single_flight import SingleFlight
+from model_pipeline.serving.actors.result_cache import ResultCache, draft_key
+from model_pipeline.utils.relations_artifact import ARTIFACT_EXTENSION, read_relations_artifact, write_relations_artifact
 import mlflow
 import mlflow.pyfunc
 from loguru import logger
 from settings import settings
 import numpy as np
 import uuid
+import asyncio
 import os
 import sys
 from typing import List, Optional
@@ -23,7 +32,36 @@ os.environ["AWS_SECRET_ACCESS_KEY"] = settings.S3_SECRET_KEY
 
 mlflow.set_tracking_uri(settings.MLFLOW_BACKEND_STORE_URI)
 
-app = FastAPI()
+training_jobs = {}
+training_executor = TrainingExecutor(
+    jobs=training_jobs,
+    max_concurrent_jobs=settings.TRAINING_MAX_CONCURRENT_JOBS,
+    max_queued_jobs=settings.TRAINING_MAX_QUEUED_JOBS
+)
+
+# Blocking serving work (first model/metadata load, scoring) runs here, off the event loop
+predict_executor = ThreadPoolExecutor(max_workers=settings.SERVING_PREDICT_WORKERS, thread_name_prefix="predict")
+predict_flights = SingleFlight()
+result_cache = ResultCache(
+    max_entries=settings.SERVING_RESULT_CACHE_SIZE,
+    ttl_seconds=settings.SERVING_RESULT_CACHE_TTL_SECONDS
+)
+model_registry.add_swap_listener(result_cache.invalidate_version)
+# Cached results were filtered with the roles of the snapshot they were computed with
+champion_metadata_index.add_swap_listener(result_cache.clear)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    training_executor.start()
+    model_registry.start()
+    champion_metadata_index.start()
+    yield
+    champion_metadata_index.stop()
+    model_registry.stop()
+    predict_executor.shutdown(wait=False)
+    training_executor.shutdown()
+
+app = FastAPI(lifespan=lifespan)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],
@@ -32,13 +70,16 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-training_jobs = {}
-
 class TrainingRequest(BaseModel):
     training_start_date: Optional[str] = None
     training_end_date: Optional[str] = None
     experiment_name: Optional[str] = "champion_recommender"
     register_as_production: bool = True
+    use_count_cube: bool = True
+    half_life_days: Optional[float] = None
+    min_games: int = 0
+    num_workers: Optional[int] = None
+    validation_ratio: float = 0.2
 
 class TrainingResponse(BaseModel):
     job_id: str
@@ -53,14 +94,66 @@ class ServingRequest(BaseModel):
     opponents: List[str]
     choose_positions: List[str]
     bans: Optional[List[str]] = None
+    synergy_weight: float = 1.0
+    counter_weight: float = 1.0
     model_name: Optional[str] = "champion_recommender"
+    # Served version: model_version when given, else the version model_alias points to
+    model_alias: str = "production"
+    model_version: Optional[str] = None
 
 class ServingResponse(BaseModel):
     result: dict
+    model_version: Optional[str] = None
+
+class DraftRequest(BaseModel):
+    top_n: int = 5
+    allies: List[str]
+    opponents: List[str]
+    choose_positions: List[str]
+    bans: Optional[List[str]] = None
+    synergy_weight: float = 1.0
+    counter_weight: float = 1.0
+
+class BatchServingRequest(BaseModel):
+    drafts: List[DraftRequest]
+    model_name: Optional[str] = "champion_recommender"
+    # Served version: model_version when given, else the version model_alias points to
+    model_alias: str = "production"
+    model_version: Optional[str] = None
+
+class BatchServingResponse(BaseModel):
+    results: List[dict]
+    model_version: str
+    num_drafts: int
+    elapsed_seconds: float
+    drafts_per_second: Optional[float] = None
+
+class TeamCompletionRequest(BaseModel):
+    top_k: int = 5
+    allies: List[str]
+    opponents: List[str]
+    open_positions: List[str]
+    bans: Optional[List[str]] = None
+    beam_width: Optional[int] = None
+    time_budget_ms: Optional[float] = None
+    model_name: Optional[str] = "champion_recommender"
+    # Served version: model_version when given, else the version model_alias points to
+    model_alias: str = "production"
+    model_version: Optional[str] = None
+
+class TeamCompletionResponse(BaseModel):
+    completions: List[dict]
+    model_version: str
+    explored_states: int
+    elapsed_ms: float
+    truncated: bool
 
 class JobStatus(BaseModel):
     job_id: str
     status: str
+    stage: Optional[str] = None
+    progress: Optional[float] = None
+    queue_position: Optional[int] = None
     training_start_date: Optional[str] = None
     training_end_date: Optional[str] = None
     mlflow_run_id: Optional[str] = None
@@ -69,9 +162,7 @@ class JobStatus(BaseModel):
     metrics: Optional[dict] = None
 class ChampionRecommenderModel(mlflow.pyfunc.PythonModel):
     def load_context(self, context):
-        import json
-        with open(context.artifacts["champion_relations"], "r") as f:
-            self.relations = json.load(f)
+        self.relations = read_relations_artifact(context.artifacts["champion_relations"])
 
     def predict(self, context, model_input):
         champion_name = model_input.get("champion_name")
@@ -100,12 +191,26 @@ def run_training_pipeline(
     training_start_date: str,
     training_end_date: str,
     experiment_name: str,
-    register_as_production: bool = True
+    register_as_production: bool = True,
+    use_count_cube: bool = True,
+    half_life_days: Optional[float] = None,
+    min_games: int = 0,
+    num_workers: Optional[int] = None,
+    validation_ratio: float = 0.2,
+    report: Optional[Callable] = None
 ):
+    """
+    Train, evaluate, log and register a model for one job.
+
+    Runs inside a TrainingExecutor worker process; report(**fields) sends
+    status, stage and progress updates back to the job entry in the API process.
+    """
     logger.info(f"Starting job {job_id}")
+    if report is None:
+        report = training_jobs[job_id].update
 
     try:
-        training_jobs[job_id]["status"] = "running"
+        report(status="running", stage="loading_matches", progress=0.0)
         mlflow.set_experiment(experiment_name)
 
         with mlflow.start_run(run_name=f"training_{datetime.now().strftime('%Y%m%d_%H%M%S')}") as run:
@@ -115,25 +220,51 @@ def run_training_pipeline(
             mlflow.log_param("training_end_date", training_end_date)
             mlflow.log_param("job_id", job_id)
 
-            pipeline = TrainingPipeline(training_start_date=training_start_date, training_end_date=training_end_date)
-
-            raw_data = pipeline.fetch_match_data()
-            total_matches = len(raw_data)
+            mlflow.log_param("use_count_cube", use_count_cube)
+            mlflow.log_param("half_life_days", half_life_days)
+            mlflow.log_param("min_games", min_games)
+            mlflow.log_param("num_workers", num_workers or settings.TRAINING_PROCESS_WORKERS)
+
+            pipeline = TrainingPipeline(
+                training_start_date=training_start_date,
+                training_end_date=training_end_date,
+                use_count_cube=use_count_cube,
+                half_life_days=half_life_days,
+                min_games=min_games,
+                num_workers=num_workers
+            )
+
+            champion_relations = pipeline.load_relations()
+            report(stage="evaluating", progress=0.5)
+            total_matches = pipeline.count_matches(champion_relations)
             mlflow.log_metric("total_matches", total_matches)
+            match_metrics = {"total_matches": total_matches}
+            if half_life_days is not None:
+                # Decay-weighted number of matches the counts amount to
+                match_metrics["effective_matches"] = champion_relations.get_match_weight()
+                mlflow.log_metric("effective_matches", match_metrics["effective_matches"])
+
+            evaluation_metrics = {}
+            if validation_ratio:
+                mlflow.log_param("validation_ratio", validation_ratio)
+                # Metrics are NaN when nothing in the holdout could be scored
+                evaluation_metrics = {
+                    f"eval_{name}": value
+                    for name, value in pipeline.evaluate(champion_relations, validation_ratio=validation_ratio).items()
+                    if not np.isnan(value)
+                }
+                mlflow.log_metrics(evaluation_metrics)
 
-            processed_data = pipeline.preprocess_data(raw_data)
+            report(stage="building_artifact", progress=0.7)
+            processed_data = pipeline.build_result(champion_relations)
             num_champions = len(processed_data["champion_index"])
             mlflow.log_metric("num_champions", num_champions)
 
             import tempfile
-            import json
-
-            serializable_data = pipeline._convert_numpy_to_serializable(processed_data)
 
             with tempfile.TemporaryDirectory() as tmpdir:
-                relations_path = os.path.join(tmpdir, "champion_relations.json")
-                with open(relations_path, "w") as f:
-                    json.dump(serializable_data, f, indent=2)
+                relations_path = os.path.join(tmpdir, f"champion_relations{ARTIFACT_EXTENSION}")
+                write_relations_artifact(processed_data, relations_path, metadata=pipeline.artifact_metadata())
 
                 # Save the MLflow model
                 model_artifact_path = "model"
@@ -143,7 +274,7 @@ def run_training_pipeline(
                     artifacts={"champion_relations": relations_path}
                 )
             # Save also to S3 (your original logic)
-            s3_key = f"model_artifacts/{training_start_date}/champion_relations.json"
+            s3_key = pipeline.artifact_key()
             pipeline.save_result_to_s3(processed_data, key=s3_key)
             mlflow.log_param("s3_artifact_location", f"s3://{settings.S3_DATA_BUCKET}/{s3_key}")
 
@@ -151,6 +282,7 @@ def run_training_pipeline(
             model_name = "champion_recommender"
 
             if register_as_production:
+                report(stage="registering", progress=0.9)
                 try:
 
                     client = MlflowClient()
@@ -182,27 +314,27 @@ def run_training_pipeline(
                 except Exception as e:
                     logger.error(f"Model registration failed: {e}")
 
-            training_jobs[job_id].update({
-                "status": "completed",
-                "mlflow_run_id": run_id,
-                "model_version": model_version,
-                "metrics": {
-                    "total_matches": total_matches,
-                    "num_champions": num_champions
+            report(
+                status="completed",
+                stage=None,
+                progress=1.0,
+                mlflow_run_id=run_id,
+                model_version=model_version,
+                metrics={
+                    **match_metrics,
+                    "num_champions": num_champions,
+                    **evaluation_metrics
                 }
-            })
+            )
 
             logger.info(f"Job {job_id} completed. Run ID: {run_id}, Model version: {model_version}")
 
     except Exception as e:
         logger.error(f"Job {job_id} failed: {str(e)}")
-        training_jobs[job_id].update({
-            "status": "failed",
-            "error": str(e)
-        })
+        report(status="failed", error=str(e))
 
 @app.post("/train-model", response_model=TrainingResponse)
-async def trigger_training(request: TrainingRequest, background_tasks: BackgroundTasks):
+async def trigger_training(request: TrainingRequest):
     if request.training_start_date is None:
         start_date = (datetime.now() - timedelta(days=30)).strftime("%Y-%m-%d")
     else:
@@ -219,14 +351,23 @@ async def trigger_training(request: TrainingRequest, background_tasks: Backgroun
         "experiment_name": request.experiment_name
     }
 
-    background_tasks.add_task(
-        run_training_pipeline,
-        job_id=job_id,
-        training_start_date=start_date,
-        training_end_date=end_date,
-        experiment_name=request.experiment_name,
-        register_as_production=request.register_as_production
-    )
+    try:
+        training_executor.submit(
+            job_id,
+            run_training_pipeline,
+            training_start_date=start_date,
+            training_end_date=end_date,
+            experiment_name=request.experiment_name,
+            register_as_production=request.register_as_production,
+            use_count_cube=request.use_count_cube,
+            half_life_days=request.half_life_days,
+            min_games=request.min_games,
+            num_workers=request.num_workers,
+            validation_ratio=request.validation_ratio
+        )
+    except TrainingQueueFull as e:
+        del training_jobs[job_id]
+        raise HTTPException(status_code=429, detail=str(e))
 
     return TrainingResponse(
         job_id=job_id,
@@ -244,24 +385,124 @@ async def get_job_status(job_id: str):
 
     return JobStatus(**training_jobs[job_id])
 
+@app.post("/jobs/{job_id}/cancel", response_model=JobStatus)
+def cancel_job(job_id: str):
+    """Cancel a queued or running training job"""
+    # A plain def: stopping a worker can take seconds, which would block the event loop
+    if job_id not in training_jobs:
+        raise HTTPException(status_code=404, detail="Job not found")
+    if not training_executor.cancel(job_id):
+        raise HTTPException(status_code=409, detail=f"Job already {training_jobs[job_id]['status']}")
+
+    return JobStatus(**training_jobs[job_id])
+
 @app.get("/jobs")
 async def list_jobs():
     """List all training jobs"""
     return {"jobs": list(training_jobs.values())}
 
+@app.post("/champions/refresh")
+def refresh_champion_metadata():
+    """Reload the in-memory champion roles and icons, e.g. after the champion crawler ran"""
+    try:
+        metadata = champion_metadata_index.refresh()
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Champion metadata refresh failed: {str(e)}")
+    return {"status": "refreshed", "num_champions": len(metadata)}
+
 @app.post("/predict", response_model=ServingResponse)
 async def predict_champion(request: ServingRequest):
+    try:
+        model = model_registry.peek(request.model_name, request.model_alias, request.model_version)
+        if model is None:
+            model = await asyncio.get_running_loop().run_in_executor(
+                predict_executor, model_registry.get, request.model_name, request.model_alias, request.model_version
+            )
+        key = draft_key(
+            request.model_name, model.version, request.allies, request.opponents,
+            request.bans, request.choose_positions, request.top_n,
+            request.synergy_weight, request.counter_weight
+        )
+        result = result_cache.get(key)
+        if result is None:
+            # Identical drafts against the same model version share one computation
+            result = await predict_flights.run(key, predict_executor, _predict_draft, key, model)
+        # Echo the positions as requested; the cached result holds the canonical order
+        return ServingResponse(
+           result={**result, "positions": [pos.upper() for pos in request.choose_positions]},
+           model_version=str(model.version)
+        )
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Prediction failed: {str(e)}")
+
+def _predict_draft(key: tuple, model):
+    """Score the canonical draft of a draft_key and cache the result"""
+    model_name, _, allies, opponents, bans, choose_positions, top_n, synergy_weight, counter_weight = key
     recommender = ServingPipeline(
+        model_name=model_name,
+        allies=list(allies),
+        opponents=list(opponents),
+        choose_positions=list(choose_positions),
+        bans=list(bans),
+        synergy_weight=synergy_weight,
+        counter_weight=counter_weight
+    )
+    result = recommender.predict(top_n=top_n, model=model)
+    result_cache.put(key, result)
+    return result
+
+@app.post("/predict/team", response_model=TeamCompletionResponse)
+async def complete_team(request: TeamCompletionRequest):
+    """Best completions of the open positions ranked by team CWR"""
+    completer = TeamCompletionPipeline(
         model_name=request.model_name,
         allies=request.allies,
         opponents=request.opponents,
-        choose_positions=request.choose_positions,
-        bans=request.bans
+        open_positions=request.open_positions,
+        bans=request.bans,
+        model_alias=request.model_alias,
+        model_version=request.model_version
     )
     try:
-        result = recommender.predict(top_n=request.top_n)
-        return ServingResponse(
-           result=result
+        result = await asyncio.get_running_loop().run_in_executor(
+            predict_executor,
+            completer.predict,
+            request.top_k,
+            request.beam_width or settings.SERVING_TEAM_BEAM_WIDTH,
+            request.time_budget_ms or settings.SERVING_TEAM_TIME_BUDGET_MS
         )
+    except HTTPException:
+        raise
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Prediction failed: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Team completion failed: {str(e)}")
+    return TeamCompletionResponse(**result)
+
+@app.get("/serving/stats")
+async def serving_stats():
+    """Result cache and request coalescing counters"""
+    return {"result_cache": result_cache.stats(), "single_flight": predict_flights.stats()}
+
+@app.get("/models/resident")
+async def resident_models():
+    """Model versions held in memory, the aliases pointing to them and their memory use"""
+    return model_registry.resident()
+
+@app.post("/predict/batch", response_model=BatchServingResponse)
+def predict_champion_batch(request: BatchServingRequest):
+    """Recommend for many drafts at once; results keep the input order"""
+    recommender = BatchServingPipeline(
+        model_name=request.model_name,
+        drafts=[draft.model_dump() for draft in request.drafts],
+        model_alias=request.model_alias,
+        model_version=request.model_version
+    )
+    try:
+        return BatchServingResponse(**recommender.predict())
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Batch prediction failed: {str(e)}")
@@ -0,0 +1,130 @@
+from typing import Callable, Dict, List, Optional
+import threading
+import time
+from loguru import logger
+import numpy as np
+from model_pipeline.utils.trino_operator import TrinoDBOperator
+from settings import settings
+
+VALID_POSITIONS = ['TOP', 'JUNGLE', 'MIDDLE', 'BOTTOM', 'SUPPORT']
+# Bit of each position in a role mask, e.g. TOP | MIDDLE == 0b00101
+POSITION_BITS = {position: 1 << bit for bit, position in enumerate(VALID_POSITIONS)}
+
+
+def positions_mask(positions: list[str]) -> int:
+    """Role mask of the requested positions; raises ValueError on an unknown position"""
+    mask = 0
+    for pos in positions:
+        pos = pos.upper()
+        if pos not in POSITION_BITS:
+            raise ValueError(f"Invalid position: {pos}. Valid positions are: {set(VALID_POSITIONS)}")
+        mask |= POSITION_BITS[pos]
+    return mask
+
+
+class DataLoader:
+    def __init__(self, trino_connector: TrinoDBOperator):
+        self.trino = trino_connector
+
+    def load_champion_data(self):
+        query = f"SELECT champion_name, roles, icon_url FROM {settings.LAKE_SCHEMA}.{settings.CHAMPION_TABLE}"
+        result = self.trino.execute_query(query)
+        logger.info(f"Loaded {len(result)} champion records")
+        return result
+
+
+class ChampionMetadata:
+    """Immutable snapshot of the champion table: name -> role mask and icon"""
+
+    def __init__(self, rows: list[dict]):
+        """
+        Args:
+            rows: Champion table rows with champion_name, roles (comma separated) and icon_url
+        """
+        self.role_masks: Dict[str, int] = {}
+        self.icon_urls: Dict[str, Optional[str]] = {}
+        for row in rows:
+            roles = [role.strip().upper() for role in (row.get("roles") or "").split(",") if role.strip()]
+            self.role_masks[row["champion_name"]] = sum(POSITION_BITS[r] for r in set(roles) if r in POSITION_BITS)
+            self.icon_urls[row["champion_name"]] = row.get("icon_url")
+        self.loaded_at = time.time()
+
+    def __len__(self):
+        return len(self.role_masks)
+
+    def roles(self, champion: str) -> list[str]:
+        mask = self.role_masks.get(champion, 0)
+        return [pos for pos in VALID_POSITIONS if mask & POSITION_BITS[pos]]
+
+    def icon_url(self, champion: str) -> Optional[str]:
+        return self.icon_urls.get(champion)
+
+    def aligned_role_masks(self, champions) -> np.ndarray:
+        """Role mask per entry of a model's champion axis; 0 for champions missing from the table"""
+        return np.array([self.role_masks.get(c, 0) for c in champions], dtype=np.uint8)
+
+
+class ChampionMetadataIndex:
+    """
+    Process-wide in-memory champion metadata for role filtering.
+
+    The champion table is read once, then re-read every ttl_seconds by a
+    background thread or on demand through refresh() (called when the champion
+    crawler finishes). Each refresh builds a new snapshot and swaps the
+    reference, so a request only reads memory. Swap listeners are called
+    after every swap, whichever path refreshed.
+    """
+
+    def __init__(self, ttl_seconds: float = 3600.0):
+        self.ttl_seconds = ttl_seconds
+        self._metadata: Optional[ChampionMetadata] = None
+        self._load_lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._refresher: Optional[threading.Thread] = None
+        self._swap_listeners: List[Callable[[], None]] = []
+
+    def add_swap_listener(self, listener: Callable[[], None]):
+        """Call listener() after each refresh swaps in a new snapshot"""
+        self._swap_listeners.append(listener)
+
+    def get(self) -> ChampionMetadata:
+        """Get the current snapshot, loading it on first use"""
+        metadata = self._metadata
+        if metadata is not None:
+            return metadata
+        with self._load_lock:
+            if self._metadata is None:
+                self.refresh()
+            return self._metadata
+
+    def refresh(self) -> ChampionMetadata:
+        with TrinoDBOperator(schema=settings.LAKE_SCHEMA) as trino_connector:
+            rows = DataLoader(trino_connector=trino_connector).load_champion_data()
+        metadata = ChampionMetadata(rows)
+        self._metadata = metadata
+        logger.info(f"Champion metadata index refreshed with {len(metadata)} champions")
+        for listener in self._swap_listeners:
+            try:
+                listener()
+            except Exception as e:
+                logger.warning(f"Champion metadata swap listener failed: {e}")
+        return metadata
+
+    def start(self):
+        self._stopped.clear()
+        self._refresher = threading.Thread(target=self._refresh_loop, name="champion-metadata-refresher", daemon=True)
+        self._refresher.start()
+
+    def stop(self):
+        self._stopped.set()
+
+    def _refresh_loop(self):
+        while not self._stopped.wait(self.ttl_seconds):
+            try:
+                self.refresh()
+            except Exception as e:
+                # Keep filtering with the last snapshot until Trino recovers
+                logger.warning(f"Could not refresh champion metadata: {e}")
+
+
+champion_metadata_index = ChampionMetadataIndex(ttl_seconds=settings.SERVING_CHAMPION_METADATA_TTL_SECONDS)
@@ -1,8 +1,11 @@
-
+from mlflow.exceptions import MlflowException
 from mlflow.tracking import MlflowClient
 from loguru import logger
 from fastapi import HTTPException
 
+# MLflow error codes of a version or alias lookup for one that does not exist
+UNKNOWN_MODEL_ERRORS = ("RESOURCE_DOES_NOT_EXIST", "INVALID_PARAMETER_VALUE")
+
 class ModelLoader:
     def __init__(self, model_name: str):
         self.model_name = model_name
@@ -10,19 +13,42 @@ class ModelLoader:
 
     def get_production_model(self):
         """Get current production model info including artifact S3 path"""
+        return self.get_model(alias="production")
+
+    def get_model(self, alias: str = "production", version: str = None):
+        """
+        Get model version info including artifact S3 path.
+
+        Args:
+            alias: Registered model alias to resolve when no version is given;
+                "production" falls back to the latest version when the alias is missing,
+                any other unknown alias raises a 404
+            version: Explicit model version, takes precedence over alias; an unknown one raises a 404
+        """
         try:
-            alias_used = True
-            try:
-                # Try to get the production model by alias
-                model_version = self.client.get_model_version_by_alias(self.model_name, "production")
-            except Exception as alias_error:
-                alias_used = False
-                logger.warning(f"No production alias found: {alias_error}")
-                # fallback to latest version
-                versions = self.client.search_model_versions(f"name='{self.model_name}'")
-                if not versions:
-                    return {"message": "No model versions found", "hint": "Try training a model first"}
-                model_version = max(versions, key=lambda v: int(v.version))
+            alias_used = version is None
+            if version is not None:
+                try:
+                    model_version = self.client.get_model_version(self.model_name, str(version))
+                except MlflowException as e:
+                    if e.error_code not in UNKNOWN_MODEL_ERRORS:
+                        raise
+                    raise HTTPException(status_code=404, detail=f"Model {self.model_name} has no version {version}")
+            else:
+                try:
+                    model_version = self.client.get_model_version_by_alias(self.model_name, alias)
+                except Exception as alias_error:
+                    if alias != "production":
+                        if isinstance(alias_error, MlflowException) and alias_error.error_code in UNKNOWN_MODEL_ERRORS:
+                            raise HTTPException(status_code=404, detail=f"Model {self.model_name} has no alias {alias}")
+                        raise
+                    alias_used = False
+                    logger.warning(f"No production alias found: {alias_error}")
+                    # fallback to latest version
+                    versions = self.client.search_model_versions(f"name='{self.model_name}'")
+                    if not versions:
+                        return {"message": "No model versions found", "hint": "Try training a model first"}
+                    model_version = max(versions, key=lambda v: int(v.version))
 
             # Get the run info to fetch parameters
             run_id = model_version.run_id
@@ -34,7 +60,7 @@ class ModelLoader:
             return {
                 "model_name": self.model_name,
                 "version": model_version.version,
-                "alias": "production" if alias_used else "none",
+                "alias": alias if alias_used else "none",
                 "run_id": run_id,
                 "source": model_version.source,
                 "tags": model_version.tags,
@@ -43,6 +69,8 @@ class ModelLoader:
                 "s3_artifact_location": s3_path
             }
 
+        except HTTPException:
+            raise
         except Exception as e:
-            logger.error(f"Error getting production model: {e}")
+            logger.error(f"Error getting model {self.model_name} (alias={alias}, version={version}): {e}")
             raise HTTPException(status_code=500, detail=str(e))
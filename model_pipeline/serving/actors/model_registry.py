@@ -0,0 +1,348 @@
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional, Tuple
+import threading
+from loguru import logger
+from model_pipeline.serving.actors.load_prod_model import ModelLoader
+from model_pipeline.serving.actors.recommender import ChampionRecommender
+from model_pipeline.serving.actors.shared_models import SharedModelStore
+from model_pipeline.utils.s3_operator import S3Operator, shared_s3_operator
+from settings import settings
+
+PRODUCTION_ALIAS = "production"
+# Maintained by the registry itself: the production version before the last alias move
+PREVIOUS_ALIAS = "previous"
+
+
+class ServedModel:
+    """A model version resident in memory"""
+
+    def __init__(self, model_name: str, version: str, run_id: str, s3_artifact_location: str, recommender: ChampionRecommender):
+        self.model_name = model_name
+        self.version = version
+        self.run_id = run_id
+        self.s3_artifact_location = s3_artifact_location
+        self.recommender = recommender
+
+    @property
+    def nbytes(self) -> int:
+        return self.recommender.nbytes
+
+
+class ModelRegistry:
+    """
+    Process-wide cache of resident model versions, addressed by alias or version.
+
+    A version is loaded from MLflow and S3 the first time it is requested and
+    then stays resident, so switching between production, previous and
+    candidate (or rolling back) never reloads. Resident versions are kept
+    within memory_budget_bytes by evicting the least recently used versions
+    that no alias points to.
+
+    A background thread polls the aliases that were requested; when one points
+    to a new version, that version is loaded next to the old one and the alias
+    is swapped. A request only reads the current references, so it always sees
+    one complete version and never waits on MLflow or S3 once it is resident.
+
+    With a shared store, versions are memory-mapped images shared by all API
+    worker processes: one worker builds an image from S3, the others map it,
+    and alias moves are published as links the other workers follow. Only one
+    worker polls MLflow, for every published alias; the others just follow
+    the links.
+    """
+
+    def __init__(self, poll_interval: float = 30.0, memory_budget_bytes: int = 1024 ** 3,
+                 shared_store: Optional[SharedModelStore] = None):
+        """
+        Args:
+            poll_interval: Seconds between alias checks
+            memory_budget_bytes: Resident model memory above which unaliased versions are evicted
+            shared_store: Store of memory-mapped images shared with the other API workers;
+                None keeps every version in this process's own memory
+        """
+        self.poll_interval = poll_interval
+        self.memory_budget_bytes = memory_budget_bytes
+        self.shared_store = shared_store
+        self._versions: "OrderedDict[Tuple[str, str], ServedModel]" = OrderedDict()
+        self._aliases: Dict[Tuple[str, str], str] = {}
+        self._load_lock = threading.RLock()
+        self._stopped = threading.Event()
+        self._poller: Optional[threading.Thread] = None
+        self._s3_operator: Optional[S3Operator] = None
+        self._swap_listeners: List[Callable[[str, str], None]] = []
+
+    def add_swap_listener(self, listener: Callable[[str, str], None]):
+        """Call listener(model_name, stale_version) when a version loses its alias or is evicted"""
+        self._swap_listeners.append(listener)
+
+    def get_s3_operator(self) -> S3Operator:
+        if self._s3_operator is None:
+            self._s3_operator = shared_s3_operator(bucket_name=settings.S3_DATA_BUCKET,
+                                                   endpoint=settings.S3_ENDPOINT,
+                                                   access_key=settings.S3_ACCESS_KEY,
+                                                   secret_key=settings.S3_SECRET_KEY,
+                                                   secure=False)
+        return self._s3_operator
+
+    def peek(self, model_name: str, alias: str = PRODUCTION_ALIAS, version: Optional[str] = None) -> Optional[ServedModel]:
+        """Get a resident model without loading; None when it is not resident"""
+        if version is None:
+            version = self._aliases.get((model_name, alias))
+            if version is None:
+                return None
+        key = (model_name, str(version))
+        model = self._versions.get(key)
+        if model is not None:
+            try:
+                self._versions.move_to_end(key)
+            except KeyError:
+                pass  # evicted concurrently; the reference already taken stays valid
+        return model
+
+    def get(self, model_name: str, alias: str = PRODUCTION_ALIAS, version: Optional[str] = None) -> ServedModel:
+        """Get a model by alias, or by version when given, loading it on first use"""
+        model = self.peek(model_name, alias, version)
+        if model is not None:
+            return model
+        if version is not None:
+            # Resolved and fetched outside the load lock: an explicit version never moves an
+            # alias, and an unknown one fails here (404) without stalling other loads
+            version = str(version)
+            info = None
+            if self.shared_store is None or not self.shared_store.has_image(model_name, version):
+                info = ModelLoader(model_name=model_name).get_model(version=version)
+            model = self._fetch(model_name, version, info)
+            with self._load_lock:
+                return self._admit(model)
+        with self._load_lock:
+            if (model_name, alias) not in self._aliases and not self.sync_shared(model_name, alias):
+                if alias == PREVIOUS_ALIAS:
+                    raise ValueError(f"No previous version of {model_name} has been served yet")
+                self.refresh(model_name, alias)
+            return self._load(model_name, self._aliases[(model_name, alias)])
+
+    def _load(self, model_name: str, version: str, info: Optional[dict] = None, evict: bool = True) -> ServedModel:
+        """Load a version unless it is resident; the caller holds the load lock"""
+        if (model_name, version) in self._versions:
+            return self._versions[(model_name, version)]
+        return self._admit(self._fetch(model_name, version, info), evict=evict)
+
+    def _fetch(self, model_name: str, version: str, info: Optional[dict] = None) -> ServedModel:
+        """Build a version from its shared image or S3 artifact; needs no lock"""
+        if self.shared_store is not None:
+            # The image records where it came from, so mapping one needs no MLflow call
+            recommender = self.shared_store.load(
+                model_name, version, lambda: self._build_image(model_name, version, info)
+            )
+            source = recommender.artifact_metadata["served_from"]
+        else:
+            source = info if info is not None else ModelLoader(model_name=model_name).get_model(version=version)
+            recommender = self._download(model_name, version, source)
+
+        return ServedModel(
+            model_name=model_name,
+            version=version,
+            run_id=source["run_id"],
+            s3_artifact_location=source["s3_artifact_location"],
+            recommender=recommender
+        )
+
+    def _admit(self, model: ServedModel, evict: bool = True) -> ServedModel:
+        """Make a fetched version resident unless another thread already did; the caller holds the load lock"""
+        key = (model.model_name, model.version)
+        if key in self._versions:
+            return self._versions[key]
+        self._versions[key] = model
+        logger.info(f"Loaded {model.model_name} version {model.version} ({model.nbytes / 1024 ** 2:.1f} MiB)")
+        if evict:
+            self._evict(keep=key)
+        return model
+
+    def _download(self, model_name: str, version: str, info: dict) -> ChampionRecommender:
+        location = info.get("s3_artifact_location")
+        if not location:
+            raise ValueError(f"No S3 artifact location for model {model_name} v{version}: {info.get('message', info)}")
+        _, s3_key = location.replace("s3://", "").split("/", 1)
+        s3_operator = self.get_s3_operator()
+        if s3_key.endswith(".json"):
+            # Models trained before the binary artifact format
+            relations = s3_operator.download_json(key=s3_key)
+        else:
+            relations = s3_operator.download_bytes(key=s3_key)
+        if relations is None:
+            raise ValueError(f"Failed to load relations from S3 path: {location}")
+        if isinstance(relations, dict):
+            return ChampionRecommender(relations=relations)
+        return ChampionRecommender.from_artifact(relations)
+
+    def _build_image(self, model_name: str, version: str, info: Optional[dict]) -> bytes:
+        if info is None:
+            info = ModelLoader(model_name=model_name).get_model(version=version)
+        recommender = self._download(model_name, version, info)
+        metadata = {
+            **recommender.artifact_metadata,
+            "served_from": {"run_id": info["run_id"], "s3_artifact_location": info["s3_artifact_location"]},
+        }
+        return recommender.to_serving_image(metadata=metadata)
+
+    def _evict(self, keep: Tuple[str, str]):
+        """Drop least recently used versions no alias points to until within the memory budget"""
+        pinned = {(name, version) for (name, _), version in self._aliases.items()} | {keep}
+        # peek reorders _versions without the lock, so only ever iterate over a snapshot
+        used = sum(model.nbytes for model in list(self._versions.values()))
+        for key in list(self._versions):
+            if used <= self.memory_budget_bytes:
+                break
+            if key in pinned:
+                continue
+            used -= self._versions.pop(key).nbytes
+            logger.info(f"Evicted {key[0]} version {key[1]} to stay within the model memory budget")
+            if self.shared_store is not None:
+                self._remove_image(*key)
+            self._notify(*key)
+        if used > self.memory_budget_bytes:
+            logger.warning(f"Aliased models use {used / 1024 ** 2:.1f} MiB, above the model memory budget")
+
+    def _remove_image(self, model_name: str, version: str):
+        try:
+            self.shared_store.remove(model_name, version)
+        except OSError as e:
+            logger.warning(f"Could not remove serving image of {model_name} version {version}: {e}")
+
+    def _notify(self, model_name: str, stale_version: str):
+        for listener in self._swap_listeners:
+            try:
+                listener(model_name, stale_version)
+            except Exception as e:
+                logger.warning(f"Model swap listener failed: {e}")
+
+    def refresh(self, model_name: str, alias: str = PRODUCTION_ALIAS) -> bool:
+        """
+        Load the version an alias points to if it is not resident yet and move the alias to it.
+
+        Returns:
+            bool: True when the alias moved to another version
+        """
+        info = ModelLoader(model_name=model_name).get_model(alias=alias)
+        if "version" not in info:
+            raise ValueError(f"Model {model_name} has no version for alias {alias}: {info.get('message', info)}")
+        return self._move_alias(model_name, alias, str(info["version"]), info=info)
+
+    def sync_shared(self, model_name: str, alias: str = PRODUCTION_ALIAS) -> bool:
+        """
+        Follow an alias that another worker already moved in the shared store, without asking MLflow.
+
+        Returns:
+            bool: True when the alias moved to another version
+        """
+        if self.shared_store is None:
+            return False
+        version = self.shared_store.resolve(model_name, alias)
+        if version is None or version == self._aliases.get((model_name, alias)):
+            return False
+        return self._move_alias(model_name, alias, version)
+
+    def _move_alias(self, model_name: str, alias: str, version: str, info: Optional[dict] = None) -> bool:
+        with self._load_lock:
+            current = self._aliases.get((model_name, alias))
+            if current == version:
+                return False
+            aliased = self.aliased_versions(model_name)
+            # Evict only once the alias has moved, so the version it leaves can go
+            self._load(model_name, version, info=info, evict=False)
+            self._aliases[(model_name, alias)] = version
+            if alias == PRODUCTION_ALIAS and current is not None:
+                # The replaced production version stays resident for instant rollback
+                self._aliases[(model_name, PREVIOUS_ALIAS)] = current
+            self._evict(keep=(model_name, version))
+            if self.shared_store is not None:
+                self._publish(model_name, alias)
+            # Evicted versions were already reported by _evict
+            stale = [v for v in aliased - self.aliased_versions(model_name) if (model_name, v) in self._versions]
+        logger.info(f"Serving {model_name}@{alias} version {version} (was {current})")
+        for stale_version in stale:
+            self._notify(model_name, stale_version)
+        return True
+
+    def _publish(self, model_name: str, alias: str):
+        """Flip the shared alias links so the other workers follow without asking MLflow"""
+        moved = [alias] + ([PREVIOUS_ALIAS] if alias == PRODUCTION_ALIAS else [])
+        for name in moved:
+            version = self._aliases.get((model_name, name))
+            if version is None:
+                continue
+            try:
+                self.shared_store.publish(model_name, name, version)
+            except OSError as e:
+                logger.warning(f"Could not publish {model_name}@{name} to the shared model store: {e}")
+
+    def aliased_versions(self, model_name: str) -> set:
+        return {version for (name, _), version in self._aliases.items() if name == model_name}
+
+    def resident(self) -> dict:
+        """Resident versions (least recently used first), alias pointers and memory use"""
+        # A snapshot: peek reorders _versions from request threads without the lock
+        models = list(self._versions.values())
+        return {
+            "models": [
+                {"model_name": m.model_name, "version": m.version, "run_id": m.run_id, "bytes": m.nbytes}
+                for m in models
+            ],
+            "aliases": [
+                {"model_name": name, "alias": alias, "version": version}
+                for (name, alias), version in list(self._aliases.items())
+            ],
+            "used_bytes": sum(m.nbytes for m in models),
+            "memory_budget_bytes": self.memory_budget_bytes,
+        }
+
+    def start(self):
+        self._stopped.clear()
+        self._poller = threading.Thread(target=self._poll_loop, name="model-registry-poller", daemon=True)
+        self._poller.start()
+
+    def stop(self):
+        self._stopped.set()
+        if self._poller is not None:
+            self._poller.join(timeout=self.poll_interval)
+
+    def _poll_loop(self):
+        while not self._stopped.wait(self.poll_interval):
+            polls_mlflow = self.shared_store is None or self.shared_store.lead_polling()
+            aliases = set(self._aliases)
+            if polls_mlflow and self.shared_store is not None:
+                # Aliases only other workers requested are kept current as well
+                aliases.update(self._shared_aliases())
+            for model_name, alias in aliases:
+                if alias == PREVIOUS_ALIAS:
+                    continue
+                try:
+                    if not self.sync_shared(model_name, alias) and polls_mlflow:
+                        self.refresh(model_name, alias)
+                except Exception as e:
+                    # Keep serving the resident version until MLflow/S3 recover
+                    logger.warning(f"Could not refresh model {model_name}@{alias}: {e}")
+
+
+    def _shared_aliases(self) -> list:
+        try:
+            return self.shared_store.aliases()
+        except OSError as e:
+            logger.warning(f"Could not list the shared model store aliases: {e}")
+            return []
+
+
+def _shared_store() -> Optional[SharedModelStore]:
+    if not settings.SERVING_SHARED_MODEL_DIR:
+        return None
+    try:
+        return SharedModelStore(root=settings.SERVING_SHARED_MODEL_DIR)
+    except OSError as e:
+        logger.warning(f"Shared model store unavailable, models stay in process memory: {e}")
+        return None
+
+
+model_registry = ModelRegistry(
+    poll_interval=settings.SERVING_MODEL_POLL_SECONDS,
+    memory_budget_bytes=int(settings.SERVING_MODEL_MEMORY_BUDGET_MB * 1024 ** 2),
+    shared_store=_shared_store()
+)
@@ -1,66 +1,263 @@
+from typing import Optional
 import numpy as np
 import pandas as pd
+from model_pipeline.serving.actors.champion_metadata import POSITION_BITS
+from model_pipeline.utils.relations_artifact import pack_arrays, read_relations_artifact, unpack_arrays
+
+# Serving image: the dense matrices a recommender scores from, ready to memory-map
+SERVING_IMAGE_MAGIC = b"CHSRVIMG"
+SERVING_IMAGE_VERSION = 1
+SERVING_IMAGE_ARRAYS = ("synergy_matrix", "counter_matrix", "synergy_wins_t", "synergy_games_t",
+                        "counter_wins_t", "counter_games_t")
+
+def check_weights(synergy_weight: float, counter_weight: float):
+    if synergy_weight < 0 or counter_weight < 0 or synergy_weight + counter_weight == 0:
+        raise ValueError(f"Weights must be non-negative and not both 0, got {synergy_weight} and {counter_weight}")
+
+
 class ChampionRecommender:
     def __init__(self, relations: dict):
         """
         Args:
             relations (ChampionRelationsEfficient): precomputed synergy and counter matrices.
         """
-        self.Ts = relations["Ts"]
-        self.Tc = relations["Tc"]
-        self.synergy_matrix = relations["synergy_matrix"]
-        self.counter_matrix = relations["counter_matrix"]
+        # Artifacts store narrow dtypes; widen once so the sums below cannot overflow
+        self.Ts = np.asarray(relations["Ts"], dtype=float)
+        self.Tc = np.asarray(relations["Tc"], dtype=float)
+        self.synergy_matrix = np.asarray(relations["synergy_matrix"], dtype=float)
+        self.counter_matrix = np.asarray(relations["counter_matrix"], dtype=float)
         self.champion_index = relations["champion_index"]
+        self.champions = np.array(sorted(self.champion_index, key=self.champion_index.get), dtype=object)
+        self.artifact_metadata = relations.get("metadata", {})
+
+        # Win counts: synergy * Ts and counter * Tc are exactly S and C, which
+        # binary artifacts carry; older artifacts only have the ratios
+        S = np.asarray(relations["S"], dtype=float) if "S" in relations else self.synergy_matrix * self.Ts
+        C = np.asarray(relations["C"], dtype=float) if "C" in relations else self.counter_matrix * self.Tc
+
+        # Row a holds the wins/games of every candidate with/against champion a,
+        # so scoring is row sums over one contiguous row per ally or opponent.
+        # The extra all-zero last row and column stand in for empty team slots.
+        pad = ((0, 1), (0, 1))
+        self.synergy_wins_t = np.pad(S.T, pad)
+        self.synergy_games_t = np.pad(self.Ts.T, pad)
+        self.counter_wins_t = np.pad(C.T, pad)
+        self.counter_games_t = np.pad(self.Tc.T, pad)
+        self._init_views()
+
+    def _init_views(self):
+        # Ts and Tc are views into the padded transposes rather than separate copies
+        self.Ts = self.synergy_games_t[:-1, :-1].T
+        self.Tc = self.counter_games_t[:-1, :-1].T
+        # Champion table snapshot, its role masks on this champion axis and
+        # {positions mask: candidate indices}, one entry per single position up front
+        self._candidates = (None, None, {})
 
-    def recommend_weighted(self, allies: list[str], opponents: list[str], bans: list[str] = None):
+    @classmethod
+    def from_artifact(cls, source):
+        """Load straight from binary artifact bytes or a path (memory-mapped)."""
+        return cls(relations=read_relations_artifact(source))
+
+    def to_serving_image(self, metadata: Optional[dict] = None) -> bytes:
+        """Serialize the scoring matrices so from_serving_image can map them without rebuilding"""
+        arrays = {name: getattr(self, name) for name in SERVING_IMAGE_ARRAYS}
+        arrays["champions"] = self.champions.astype(str)
+        return pack_arrays(arrays, metadata=metadata, magic=SERVING_IMAGE_MAGIC, version=SERVING_IMAGE_VERSION)
+
+    @classmethod
+    def from_serving_image(cls, source) -> "ChampionRecommender":
         """
-        Recommend top N champions based on weighted average of synergy and counter scores.
+        Build a recommender whose matrices are read-only views into a serving image.
 
         Args:
-            allies (list[str]): Current allied champions
-            opponents (list[str]): Current enemy champions
-            bans (list[str]): Champions that cannot be picked
-            top_n (int): Number of top champions to return
+            source: Serving image bytes, or a path to memory-map; processes mapping
+                the same file share one physical copy of the matrices
+        """
+        _, arrays, metadata = unpack_arrays(source, magic=SERVING_IMAGE_MAGIC, versions=(SERVING_IMAGE_VERSION,))
+        recommender = cls.__new__(cls)
+        for name in SERVING_IMAGE_ARRAYS:
+            setattr(recommender, name, arrays[name])
+        recommender.champions = arrays["champions"].astype(object)
+        recommender.champion_index = {c: i for i, c in enumerate(recommender.champions.tolist())}
+        recommender.artifact_metadata = metadata
+        recommender._init_views()
+        return recommender
+
+    @property
+    def nbytes(self) -> int:
+        """Memory held by the score matrices"""
+        return sum(getattr(self, name).nbytes for name in SERVING_IMAGE_ARRAYS)
+
+    def to_indices(self, names: list[str], strict: bool = True) -> np.ndarray:
+        """Map champion names to matrix indices; unknown names raise unless strict is False"""
+        unknown = [name for name in names if name not in self.champion_index]
+        if unknown and strict:
+            raise ValueError(f"Unknown champions: {unknown}")
+        return np.array([self.champion_index[name] for name in names if name in self.champion_index], dtype=np.intp)
+
+    def score(self, allies: list[str], opponents: list[str], bans: list[str] = None,
+              synergy_weight: float = 1.0, counter_weight: float = 1.0) -> np.ndarray:
+        """
+        Weighted synergy/counter score of every champion for one draft.
+
+        score[c] = (ws * sum_a S[c, a] + wc * sum_o C[c, o]) / (ws * sum_a Ts[c, a] + wc * sum_o Tc[c, o])
+
+        With both weights 1 this is the pooled win rate over every shared game,
+        i.e. synergy and counter ratios weighted by their game counts.
+
+        Args:
+            synergy_weight, counter_weight: ws and wc; 0 drops that side entirely
+
+        Returns:
+            np.ndarray: Score per champion index; -inf for picked or banned
+                champions and for champions without any (weighted) shared games
+        """
+        return self.score_batch([allies], [opponents], [bans or []], synergy_weight, counter_weight)[0]
+
+    @staticmethod
+    def combine(synergy_wins, synergy_games, counter_wins, counter_games, available,
+                synergy_weight: float = 1.0, counter_weight: float = 1.0) -> np.ndarray:
+        """Weighted win rate from the four row sums; -inf where not available or without games"""
+        check_weights(synergy_weight, counter_weight)
+        numerator = synergy_weight * synergy_wins + counter_weight * counter_wins
+        denominator = synergy_weight * synergy_games + counter_weight * counter_games
+        available = available & (denominator != 0)
+        return np.divide(numerator, denominator, out=np.full(available.shape, -np.inf), where=available)
+
+    def _padded_indices(self, drafts: list[list[str]], strict: bool = True) -> np.ndarray:
+        """Stack per-draft indices into one (drafts, longest) array padded with the zero row index"""
+        indices = [self.to_indices(names, strict=strict) for names in drafts]
+        padded = np.full((len(indices), max((len(i) for i in indices), default=0)), len(self.champions), dtype=np.intp)
+        for row, idx in enumerate(indices):
+            padded[row, :len(idx)] = idx
+        return padded
+
+    def score_batch(self, allies: list[list[str]], opponents: list[list[str]], bans: list[list[str]] = None,
+                    synergy_weight: float = 1.0, counter_weight: float = 1.0) -> np.ndarray:
+        """
+        Score many drafts at once with the score() formula.
+
+        Teams of different sizes are padded with the all-zero row, so each
+        draft is a fixed-width gather and the sums stay bit-identical to score().
+
+        Args:
+            allies, opponents, bans: One champion name list per draft
+            synergy_weight, counter_weight: Weights of the two sides, see score()
 
         Returns:
-            list[tuple[str, float]]: List of (champion, score) sorted by score (desc)
+            np.ndarray: (drafts, champions) scores, -inf where not recommendable
         """
         if bans is None:
-            bans = []
+            bans = [[] for _ in allies]
+        ally_idx = self._padded_indices(allies)
+        opponent_idx = self._padded_indices(opponents)
+        ban_idx = self._padded_indices([b or [] for b in bans], strict=False)
 
-        synergy = self.synergy_matrix
-        counter = self.counter_matrix
-        Ts = self.Ts
-        Tc = self.Tc
-        idx = self.champion_index
-        champions = self.champion_index  # all available champion names
+        # One spare column absorbs the padding index
+        available = np.ones((len(ally_idx), len(self.champions) + 1), dtype=bool)
+        for idx in (ally_idx, opponent_idx, ban_idx):
+            np.put_along_axis(available, idx, False, axis=1)
+        return self.combine(
+            self.synergy_wins_t[ally_idx].sum(axis=1)[:, :-1],
+            self.synergy_games_t[ally_idx].sum(axis=1)[:, :-1],
+            self.counter_wins_t[opponent_idx].sum(axis=1)[:, :-1],
+            self.counter_games_t[opponent_idx].sum(axis=1)[:, :-1],
+            available[:, :-1],
+            synergy_weight,
+            counter_weight
+        )
 
+    def candidates(self, metadata, wanted: int) -> np.ndarray:
+        """
+        Sorted indices of the champions playing any of the wanted positions.
 
-        results = []
+        Per-position candidate arrays are derived once per champion metadata
+        snapshot; a multi-position union is derived on first request and kept.
 
-        for c in champions:
-            if c in allies or c in opponents or c in bans:
-                continue
+        Args:
+            metadata: ChampionMetadata snapshot with the champion role masks
+            wanted: Role mask of the requested positions
+        """
+        snapshot, role_masks, by_mask = self._candidates
+        if snapshot is not metadata:
+            role_masks = metadata.aligned_role_masks(self.champions)
+            by_mask = {bit: np.flatnonzero(role_masks & bit) for bit in POSITION_BITS.values()}
+            self._candidates = (metadata, role_masks, by_mask)
+        if wanted not in by_mask:
+            # Union of the positions' candidates, kept in champion index order
+            by_mask[wanted] = np.flatnonzero(role_masks & wanted)
+        return by_mask[wanted]
 
-            i = idx[c]
+    def score_candidates(self, allies: list[str], opponents: list[str], bans: list[str], candidates: np.ndarray,
+                         synergy_weight: float = 1.0, counter_weight: float = 1.0) -> np.ndarray:
+        """
+        score() restricted to the given candidate indices.
 
-            synergy_weighted = sum(
-                synergy[i][idx[a]] * Ts[i][idx[a]] for a in allies if Ts[i][idx[a]] > 0
-            )
-            counter_weighted = sum(
-                counter[i][idx[o]] * Tc[i][idx[o]] for o in opponents if Tc[i][idx[o]] > 0
-            )
+        Only the candidate columns of the ally and opponent rows are gathered;
+        the sums run in the same order, so the scores equal score()[candidates].
+        """
+        ally_idx = self.to_indices(allies)
+        opponent_idx = self.to_indices(opponents)
+        ban_idx = self.to_indices(bans or [], strict=False)
 
-            total_weight = sum(Ts[i][idx[a]] for a in allies) + sum(Tc[i][idx[o]] for o in opponents)
+        allies_rows, opponent_rows = np.ix_(ally_idx, candidates), np.ix_(opponent_idx, candidates)
+        return self.combine(
+            self.synergy_wins_t[allies_rows].sum(axis=0),
+            self.synergy_games_t[allies_rows].sum(axis=0),
+            self.counter_wins_t[opponent_rows].sum(axis=0),
+            self.counter_games_t[opponent_rows].sum(axis=0),
+            ~np.isin(candidates, np.concatenate([ally_idx, opponent_idx, ban_idx])),
+            synergy_weight,
+            counter_weight
+        )
 
-            if total_weight == 0:
-                continue
+    def recommend_positions(self, allies: list[str], opponents: list[str], bans: list[str], metadata, wanted: int,
+                            top_n: Optional[int] = None, synergy_weight: float = 1.0, counter_weight: float = 1.0):
+        """
+        Best champions for the wanted positions, scoring only their candidates.
 
-            score = (synergy_weighted + counter_weighted) / total_weight
-            results.append((c, score))
+        Returns:
+            tuple: (champion index array, score array), best first
+        """
+        candidates = self.candidates(metadata, wanted)
+        scores = self.score_candidates(allies, opponents, bans, candidates, synergy_weight, counter_weight)
+        best = self.top_k(scores, top_n)
+        return candidates[best], scores[best]
 
-        # Sort & convert to DataFrame
-        results.sort(key=lambda x: x[1], reverse=True)
+    @staticmethod
+    def top_k(scores: np.ndarray, k: Optional[int] = None) -> np.ndarray:
+        """
+        Indices of the k best finite scores, best first; ties keep champion index order.
 
-        df_results = pd.DataFrame(results, columns=["champion", "score"])
-        return df_results
+        Args:
+            scores: Score per champion index, -inf for excluded champions
+            k: Number of champions to keep (all scored champions when None)
+        """
+        candidates = np.flatnonzero(np.isfinite(scores))
+        if k is not None and k < len(candidates):
+            if k <= 0:
+                return candidates[:0]
+            kth = np.argpartition(-scores[candidates], k - 1)[:k]
+            # Keep every champion tied with the k-th score so the stable order decides
+            candidates = candidates[scores[candidates] >= scores[candidates[kth]].min()]
+        order = np.lexsort((candidates, -scores[candidates]))
+        return candidates[order][:k]
+
+    def recommend_weighted(self, allies: list[str], opponents: list[str], bans: list[str] = None, top_n: Optional[int] = None,
+                           synergy_weight: float = 1.0, counter_weight: float = 1.0):
+        """
+        Recommend top N champions based on weighted average of synergy and counter scores.
+
+        Args:
+            allies (list[str]): Current allied champions
+            opponents (list[str]): Current enemy champions
+            bans (list[str]): Champions that cannot be picked
+            top_n (int): Number of top champions to return (all when None)
+            synergy_weight, counter_weight (float): Weights of the two sides, see score()
+
+        Returns:
+            pd.DataFrame: champion and score columns sorted by score (desc)
+        """
+        scores = self.score(allies, opponents, bans, synergy_weight, counter_weight)
+        best = self.top_k(scores, top_n)
+        return pd.DataFrame({"champion": self.champions[best], "score": scores[best]})
@@ -0,0 +1,88 @@
+from collections import OrderedDict
+from typing import Hashable, Optional
+import threading
+import time
+
+
+def draft_key(model_name: str, version, allies: list[str], opponents: list[str], bans: Optional[list[str]],
+              choose_positions: list[str], top_n: int, synergy_weight: float = 1.0, counter_weight: float = 1.0) -> tuple:
+    """
+    Canonical identity of a recommendation request.
+
+    Pick order does not change which champions are recommended, so allies,
+    opponents, bans and positions are sorted; the draft is then scored in this
+    canonical order so every permutation gets the very same result.
+    """
+    return (
+        model_name,
+        str(version),
+        tuple(sorted(allies)),
+        tuple(sorted(opponents)),
+        tuple(sorted(set(bans or []))),
+        tuple(sorted({pos.upper() for pos in choose_positions})),
+        top_n,
+        float(synergy_weight),
+        float(counter_weight),
+    )
+
+
+class ResultCache:
+    """
+    Thread-safe LRU cache of recommendation results with a time to live.
+
+    Keys start with (model_name, model_version), so results of a replaced
+    model version are never served; invalidate_version() also frees them as
+    soon as the version loses its alias or is evicted.
+    """
+
+    def __init__(self, max_entries: int = 10000, ttl_seconds: float = 600.0):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[Hashable, tuple[float, dict]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Hashable) -> Optional[dict]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] < time.monotonic():
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, key: Hashable, value: dict):
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl_seconds, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate_version(self, model_name: str, version) -> int:
+        """Drop the entries of one model version; returns how many were dropped"""
+        with self._lock:
+            stale = [k for k in self._entries if k[0] == model_name and k[1] == str(version)]
+            for key in stale:
+                del self._entries[key]
+        return len(stale)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / lookups if lookups else None,
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "ttl_seconds": self.ttl_seconds,
+        }
@@ -0,0 +1,153 @@
+from contextlib import contextmanager
+from typing import Callable, Optional
+import fcntl
+import os
+from loguru import logger
+from model_pipeline.serving.actors.recommender import ChampionRecommender
+
+IMAGE_EXTENSION = ".img"
+
+
+class SharedModelStore:
+    """
+    Serving images of model versions in a directory shared by the API worker processes.
+
+    With the directory on tmpfs (/dev/shm) every uvicorn worker memory-maps the
+    same image read-only, so N workers hold one physical copy of the matrices
+    instead of N. Images are immutable and named per version; the first worker
+    that needs a version builds it under an exclusive file lock while the
+    others wait and then map the result. Each alias is a symlink to an image,
+    replaced atomically with rename, so a reader resolves either the old or
+    the new version and never a partial file.
+    """
+
+    def __init__(self, root: str):
+        """
+        Args:
+            root: Directory holding one subdirectory of images and alias links per model
+        """
+        self.root = root
+        os.makedirs(root, exist_ok=True)
+        self._poller_lock = None
+
+    def _model_dir(self, model_name: str) -> str:
+        path = os.path.join(self.root, model_name)
+        os.makedirs(path, exist_ok=True)
+        return path
+
+    def image_path(self, model_name: str, version: str) -> str:
+        return os.path.join(self._model_dir(model_name), f"v{version}{IMAGE_EXTENSION}")
+
+    def has_image(self, model_name: str, version: str) -> bool:
+        return os.path.exists(self.image_path(model_name, version))
+
+    @contextmanager
+    def _locked(self, model_name: str):
+        with open(os.path.join(self._model_dir(model_name), ".lock"), "w") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def load(self, model_name: str, version: str, build: Callable[[], bytes]) -> ChampionRecommender:
+        """
+        Map the image of a version, building it first when no worker has yet.
+
+        Args:
+            model_name, version: Model version to map
+            build: Returns the serving image bytes; called by one worker only
+
+        Returns:
+            ChampionRecommender: Recommender whose matrices are views into the shared image
+        """
+        path = self.image_path(model_name, version)
+        try:
+            # Once mapped, a concurrent remove only unlinks the name; the mapping stays valid
+            return ChampionRecommender.from_serving_image(path)
+        except FileNotFoundError:
+            pass
+        with self._locked(model_name):
+            if not os.path.exists(path):
+                image = build()
+                partial = f"{path}.{os.getpid()}.tmp"
+                with open(partial, "wb") as f:
+                    f.write(image)
+                os.replace(partial, path)
+                logger.info(f"Published serving image {path} ({len(image) / 1024 ** 2:.1f} MiB)")
+            # Mapped under the lock, so remove cannot unlink the image between the check and the map
+            return ChampionRecommender.from_serving_image(path)
+
+    def publish(self, model_name: str, alias: str, version: str):
+        """
+        Point an alias at a version's image with one atomic rename.
+
+        Taken under the lock, so remove never deletes an image an alias is
+        being moved to.
+        """
+        link = os.path.join(self._model_dir(model_name), alias)
+        partial = f"{link}.{os.getpid()}.tmp"
+        with self._locked(model_name):
+            if os.path.lexists(partial):
+                os.unlink(partial)
+            os.symlink(os.path.basename(self.image_path(model_name, version)), partial)
+            os.replace(partial, link)
+
+    def resolve(self, model_name: str, alias: str) -> Optional[str]:
+        """Version an alias link points to; None when no worker has published the alias"""
+        try:
+            target = os.readlink(os.path.join(self.root, model_name, alias))
+        except OSError:
+            return None
+        return target[1:-len(IMAGE_EXTENSION)]
+
+    def aliases(self) -> list[tuple]:
+        """(model_name, alias) of every alias link published by any worker"""
+        published = []
+        for model_name in os.listdir(self.root):
+            model_dir = os.path.join(self.root, model_name)
+            if not os.path.isdir(model_dir):
+                continue
+            for entry in os.listdir(model_dir):
+                if not entry.endswith(".tmp") and os.path.islink(os.path.join(model_dir, entry)):
+                    published.append((model_name, entry))
+        return published
+
+    def lead_polling(self) -> bool:
+        """
+        Whether this process is the single worker that polls MLflow for all of them.
+
+        The first caller keeps an exclusive lock on the store's .poller file
+        until it exits; the others get False, and one of them takes over on
+        its next call once that process is gone.
+        """
+        if self._poller_lock is None:
+            lock = open(os.path.join(self.root, ".poller"), "w")
+            try:
+                fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                lock.close()
+                return False
+            self._poller_lock = lock
+            logger.info(f"Process {os.getpid()} polls MLflow for the shared model store")
+        return True
+
+    def remove(self, model_name: str, version: str) -> bool:
+        """
+        Delete a version's image unless an alias links to it.
+
+        Workers that still map the image keep their mapping; the memory is
+        released once the last of them drops it.
+        """
+        path = self.image_path(model_name, version)
+        model_dir = os.path.dirname(path)
+        with self._locked(model_name):
+            for entry in os.listdir(model_dir):
+                link = os.path.join(model_dir, entry)
+                if os.path.islink(link) and os.readlink(link) == os.path.basename(path):
+                    return False
+            try:
+                os.unlink(path)
+            except FileNotFoundError:
+                return False
+        return True
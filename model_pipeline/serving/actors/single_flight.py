@@ -0,0 +1,47 @@
+from concurrent.futures import Executor
+from typing import Callable, Dict, Hashable
+import asyncio
+
+
+class SingleFlight:
+    """
+    Coalesce identical concurrent calls into one computation.
+
+    The first caller for a key starts func on the executor; callers arriving
+    with the same key while it runs await the same future instead of
+    computing again. The entry is dropped as soon as the computation ends,
+    so results are never served after the fact (that is a cache's job).
+    """
+
+    def __init__(self):
+        self._in_flight: Dict[Hashable, asyncio.Future] = {}
+        self.calls = 0
+        self.coalesced = 0
+
+    async def run(self, key: Hashable, executor: Executor, func: Callable, *args):
+        """
+        Args:
+            key: Identity of the computation; must capture everything func depends on
+            executor: Executor the blocking func runs on
+            func, args: Blocking computation to run once per key at a time
+
+        Returns:
+            func(*args) result, shared by every caller of the same flight
+        """
+        self.calls += 1
+        future = self._in_flight.get(key)
+        if future is None:
+            future = asyncio.get_running_loop().run_in_executor(executor, func, *args)
+            self._in_flight[key] = future
+            future.add_done_callback(lambda done: self._forget(key, done))
+        else:
+            self.coalesced += 1
+        # Shielded so one caller disconnecting does not cancel the others' result
+        return await asyncio.shield(future)
+
+    def _forget(self, key: Hashable, future: asyncio.Future):
+        if self._in_flight.get(key) is future:
+            del self._in_flight[key]
+
+    def stats(self) -> dict:
+        return {"calls": self.calls, "coalesced": self.coalesced, "in_flight": len(self._in_flight)}
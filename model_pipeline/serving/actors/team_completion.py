@@ -0,0 +1,184 @@
+from typing import Optional
+import heapq
+import time
+from loguru import logger
+import numpy as np
+from model_pipeline.serving.actors.champion_metadata import ChampionMetadata, POSITION_BITS, positions_mask
+from model_pipeline.serving.actors.recommender import ChampionRecommender
+
+TEAM_SIZE = 5
+
+
+class TeamCompleter:
+    def __init__(self, recommender: ChampionRecommender, metadata: ChampionMetadata, beam_width: int = 64,
+                 time_budget_ms: float = 250.0):
+        """
+        Beam search over the open positions for the completions with the best team CWR.
+
+        Team CWR is Evaluation.compute_cwr: the synergy of every ally pair plus
+        the counter of every ally against every opponent, averaged over the
+        pairs. Positions are filled in request order, one candidate per
+        position from the champions that play it.
+
+        Args:
+            recommender: Resident recommender with the synergy and counter matrices
+            metadata: Champion metadata snapshot for the role constraints
+            beam_width: Partial teams kept per position
+            time_budget_ms: Past this budget the remaining positions are filled greedily
+        """
+        self.recommender = recommender
+        self.metadata = metadata
+        self.beam_width = beam_width
+        self.time_budget_ms = time_budget_ms
+
+    def complete(self, allies: list[str], opponents: list[str], bans: Optional[list[str]], open_positions: list[str],
+                 top_k: int = 5) -> dict:
+        """
+        Args:
+            allies, opponents, bans: Current draft
+            open_positions: Positions left to fill, one champion each
+            top_k: Number of completions to return
+
+        Returns:
+            dict: completions (best first, each with champions per position and cwr),
+                explored_states, elapsed_ms and truncated (budget ran out)
+        """
+        started = time.perf_counter()
+        deadline = started + self.time_budget_ms / 1000.0
+        recommender = self.recommender
+        positions = [pos.upper() for pos in open_positions]
+        positions_mask(positions)
+        if len(set(positions)) != len(positions):
+            raise ValueError(f"Open positions must be distinct: {positions}")
+
+        ally_idx = recommender.to_indices(allies)
+        opponent_idx = recommender.to_indices(opponents)
+        if not positions or len(ally_idx) + len(positions) > TEAM_SIZE:
+            raise ValueError(f"{len(ally_idx)} allies leave {TEAM_SIZE - len(ally_idx)} positions, got {len(positions)}")
+        excluded = np.concatenate([ally_idx, opponent_idx, recommender.to_indices(bans or [], strict=False)])
+        candidates = {
+            pos: np.setdiff1d(recommender.candidates(self.metadata, POSITION_BITS[pos]), excluded)
+            for pos in positions
+        }
+
+        synergy = recommender.synergy_matrix
+        counter = recommender.counter_matrix
+        team_size = len(ally_idx) + len(positions)
+        pairs = team_size * (team_size - 1) / 2 + team_size * len(opponent_idx)
+        # A candidate's counter against the opponents does not depend on the rest of the team
+        counter_gain = counter[:, opponent_idx].sum(axis=1)
+        pool = np.unique(np.concatenate(list(candidates.values())))
+        max_pair = float(synergy[np.ix_(pool, pool)].max()) if len(pool) else 0.0
+
+        base = synergy[np.ix_(ally_idx, ally_idx)][np.triu_indices(len(ally_idx), k=1)].sum() \
+            + counter[np.ix_(ally_idx, opponent_idx)].sum()
+
+        search = _Search(candidates, synergy, counter_gain, max_pair, ally_idx, positions, top_k, deadline)
+        # A narrow greedy pass first: its completions are the incumbents the
+        # upper bound is tested against from the first depth of the full search
+        search.run(float(base), beam_width=top_k, prune=False)
+        truncated = search.run(float(base), beam_width=self.beam_width, prune=True)
+        if truncated:
+            logger.warning(f"Team completion over {self.time_budget_ms}ms budget, finished greedily")
+        best = search.best
+
+        completions = [
+            {
+                "champions": [
+                    {
+                        "position": pos,
+                        "champion_name": recommender.champions[idx],
+                        "icon_url": self.metadata.icon_url(recommender.champions[idx])
+                    }
+                    for pos, idx in zip(positions, picks)
+                ],
+                "cwr": score / pairs if pairs else 0.0,
+            }
+            for score, picks in sorted(best, reverse=True)
+        ]
+        return {
+            "completions": completions,
+            "explored_states": search.explored,
+            "elapsed_ms": (time.perf_counter() - started) * 1000.0,
+            "truncated": truncated,
+        }
+
+
+class _Search:
+    """Branch and bound over the open positions, sharing its incumbents and transpositions across runs"""
+
+    def __init__(self, candidates: dict, synergy: np.ndarray, counter_gain: np.ndarray, max_pair: float,
+                 ally_idx: np.ndarray, positions: list[str], top_k: int, deadline: float):
+        self.candidates = candidates
+        self.synergy = synergy
+        self.counter_gain = counter_gain
+        self.max_pair = max_pair
+        self.ally_idx = ally_idx
+        self.positions = positions
+        self.top_k = top_k
+        self.deadline = deadline
+        self.best = []  # min-heap of (team score, picks) holding the top_k complete teams
+        self.found = set()  # teams in best, so a second run does not add them twice
+        self.explored = 0
+
+    def _offer(self, score: float, picks: tuple):
+        team = frozenset(picks)
+        if team in self.found:
+            return
+        heapq.heappush(self.best, (score, picks))
+        self.found.add(team)
+        if len(self.best) > self.top_k:
+            self.found.discard(frozenset(heapq.heappop(self.best)[1]))
+
+    def run(self, base: float, beam_width: int, prune: bool) -> bool:
+        """
+        Returns:
+            bool: True when the time budget ran out and the search finished greedily
+        """
+        candidates, synergy, counter_gain = self.candidates, self.synergy, self.counter_gain
+        beam = [(base, ())]
+        seen = set()  # transpositions: the same champions reached through other position orders
+        truncated = False
+
+        for depth, pos in enumerate(self.positions):
+            remaining = self.positions[depth + 1:]
+            last = not remaining
+            future = np.unique(np.concatenate([candidates[p] for p in remaining])) if remaining else None
+            # Any later pick adds at most max_pair with each pick after the current one
+            pair_bound = (len(remaining) + len(remaining) * (len(remaining) - 1) / 2) * self.max_pair
+
+            children = []
+            for partial, picks in beam:
+                if children and not truncated and time.perf_counter() > self.deadline:
+                    # Out of time: keep the children found so far and go on greedily
+                    truncated, beam_width = True, 1
+                    break
+                team = np.concatenate([self.ally_idx, np.array(picks, dtype=np.intp)])
+                options = candidates[pos][~np.isin(candidates[pos], picks)]
+                gains = synergy[np.ix_(options, team)].sum(axis=1) + counter_gain[options]
+                bound = 0.0
+                if not last:
+                    future_gains = synergy[np.ix_(future, team)].sum(axis=1) + counter_gain[future]
+                    top = min(len(remaining), len(future_gains))
+                    bound = float(np.partition(future_gains, len(future_gains) - top)[len(future_gains) - top:].sum()) \
+                        + pair_bound
+                for option, gain in zip(options.tolist(), gains.tolist()):
+                    child = picks + (option,)
+                    key = frozenset(child)
+                    if key in seen:
+                        continue
+                    seen.add(key)
+                    self.explored += 1
+                    score = partial + gain
+                    if prune and len(self.best) == self.top_k and score + bound <= self.best[0][0]:
+                        continue  # cannot beat the k-th best complete team
+                    if last:
+                        self._offer(score, child)
+                    else:
+                        children.append((score + bound, score, child))
+
+            if last:
+                break
+            children = heapq.nlargest(beam_width, children)
+            beam = [(score, child) for _, score, child in children]
+        return truncated
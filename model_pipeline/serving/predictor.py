@@ -1,44 +1,178 @@
-from model_pipeline.serving.actors.load_prod_model import ModelLoader
+import time
+from loguru import logger
+import numpy as np
+from model_pipeline.serving.actors.model_registry import PRODUCTION_ALIAS, ModelRegistry, ServedModel, model_registry
+from model_pipeline.serving.actors.champion_metadata import ChampionMetadataIndex, champion_metadata_index, positions_mask
 from model_pipeline.serving.actors.post_processing import PostProcessor
-from model_pipeline.serving.actors.recommender import ChampionRecommender
-from model_pipeline.utils.s3_operator import S3Operator
-from settings import settings
+from model_pipeline.serving.actors.recommender import check_weights
+from model_pipeline.serving.actors.team_completion import TeamCompleter
+
+# Drafts scored per stacked pass; bounds the (drafts, team, champions) gather
+BATCH_CHUNK_SIZE = 1024
 
 class ServingPipeline:
-    def __init__(self, model_name: str, allies: list[str], opponents: list[str], choose_positions: list[str], bans: list[str] = None):
+    def __init__(self, model_name: str, allies: list[str], opponents: list[str], choose_positions: list[str], bans: list[str] = None,
+                 registry: ModelRegistry = None, metadata_index: ChampionMetadataIndex = None,
+                 synergy_weight: float = 1.0, counter_weight: float = 1.0,
+                 model_alias: str = PRODUCTION_ALIAS, model_version: str = None):
         self.model_name = model_name
+        self.model_alias = model_alias
+        self.model_version = model_version
         self.allies = allies
         self.opponents = opponents
         self.bans = bans if bans is not None else []
         self.choose_positions = choose_positions
-        self.s3_operator = S3Operator(bucket_name=settings.S3_DATA_BUCKET,
-                                 endpoint=settings.S3_ENDPOINT,
-                                 access_key=settings.S3_ACCESS_KEY,
-                                 secret_key=settings.S3_SECRET_KEY,
-                                 secure=False)
-
-    def load_production_model(self):
-        model_loader = ModelLoader(model_name=self.model_name)
-        return model_loader.get_production_model()
-
-    def predict(self, top_n: int = 5):
-        champion_relations = self.load_production_model().get('s3_artifact_location')
-        champion_relations = champion_relations.replace("s3://", "")
-        _, key = champion_relations.split("/", 1)
-        relations_dict = self.s3_operator.download_json(key=key)
-        if relations_dict is None:
-            raise ValueError(f"Failed to load relations from S3 path: {champion_relations}")
-        recommender = ChampionRecommender(relations=relations_dict)
-        raw_result = recommender.recommend_weighted(
+        self.synergy_weight = synergy_weight
+        self.counter_weight = counter_weight
+        self.registry = registry if registry is not None else model_registry
+        self.metadata_index = metadata_index if metadata_index is not None else champion_metadata_index
+
+    def load_production_model(self) -> ServedModel:
+        return self.registry.get(self.model_name, alias=self.model_alias, version=self.model_version)
+
+    def predict(self, top_n: int = 5, model: ServedModel = None):
+        """
+        Args:
+            top_n: Number of recommendations
+            model: Resident model to use (the requested alias or version when None)
+        """
+        recommender = (model or self.load_production_model()).recommender
+        metadata = self.metadata_index.get()
+        best, scores = recommender.recommend_positions(
             allies=self.allies,
             opponents=self.opponents,
             bans=self.bans,
+            metadata=metadata,
+            wanted=positions_mask(self.choose_positions),
+            top_n=top_n,
+            synergy_weight=self.synergy_weight,
+            counter_weight=self.counter_weight
         )
         post_processor = PostProcessor(
-            champion_recommender_results=raw_result,
-            top_n=top_n,
-            choose_positions=self.choose_positions
+            champions=recommender.champions[best],
+            scores=scores,
+            choose_positions=self.choose_positions,
+            metadata=metadata
         )
 
         response = post_processor.run()
         return response
+
+
+class BatchServingPipeline:
+    def __init__(self, model_name: str, drafts: list[dict], registry: ModelRegistry = None,
+                 metadata_index: ChampionMetadataIndex = None, model_alias: str = PRODUCTION_ALIAS,
+                 model_version: str = None):
+        """
+        Args:
+            model_name: Registered model to serve
+            drafts: Dicts with allies, opponents, choose_positions and optional bans,
+                top_n, synergy_weight and counter_weight
+            model_alias: Alias of the version to serve when model_version is not given
+            model_version: Explicit version to serve
+        """
+        self.model_name = model_name
+        self.model_alias = model_alias
+        self.model_version = model_version
+        self.drafts = drafts
+        self.registry = registry if registry is not None else model_registry
+        self.metadata_index = metadata_index if metadata_index is not None else champion_metadata_index
+
+    def predict(self) -> dict:
+        """
+        Score every draft in one stacked pass, then keep each draft's best
+        champions for its positions with the in-memory role masks.
+
+        Returns:
+            dict: results (in input order; a draft that cannot be scored gets
+                {"error": ...}), model_version, num_drafts, elapsed_seconds, drafts_per_second
+        """
+        started = time.perf_counter()
+        model = self.registry.get(self.model_name, alias=self.model_alias, version=self.model_version)
+        recommender = model.recommender
+
+        # Drafts are stacked per (synergy_weight, counter_weight) pair
+        results, scorable = [None] * len(self.drafts), {}
+        for position, draft in enumerate(self.drafts):
+            try:
+                recommender.to_indices(draft["allies"])
+                recommender.to_indices(draft["opponents"])
+                weights = (draft.get("synergy_weight", 1.0), draft.get("counter_weight", 1.0))
+                check_weights(*weights)
+                scorable.setdefault(weights, []).append(position)
+            except ValueError as e:
+                results[position] = {"error": str(e)}
+
+        metadata = self.metadata_index.get()
+        role_masks = metadata.aligned_role_masks(recommender.champions)
+        chunks = [
+            (weights, positions[start:start + BATCH_CHUNK_SIZE])
+            for weights, positions in scorable.items()
+            for start in range(0, len(positions), BATCH_CHUNK_SIZE)
+        ]
+        for (synergy_weight, counter_weight), chunk in chunks:
+            scores = recommender.score_batch(
+                [self.drafts[p]["allies"] for p in chunk],
+                [self.drafts[p]["opponents"] for p in chunk],
+                [self.drafts[p].get("bans") or [] for p in chunk],
+                synergy_weight,
+                counter_weight
+            )
+            for position, draft_scores in zip(chunk, scores):
+                draft = self.drafts[position]
+                try:
+                    wanted = (role_masks & positions_mask(draft["choose_positions"])) != 0
+                except ValueError as e:
+                    results[position] = {"error": str(e)}
+                    continue
+                draft_scores = np.where(wanted, draft_scores, -np.inf)
+                best = recommender.top_k(draft_scores, draft.get("top_n", 5))
+                results[position] = PostProcessor(
+                    champions=recommender.champions[best],
+                    scores=draft_scores[best],
+                    choose_positions=draft["choose_positions"],
+                    metadata=metadata
+                ).run()
+
+        elapsed = time.perf_counter() - started
+        logger.info(f"Scored {len(self.drafts)} drafts in {elapsed:.3f}s with {self.model_name} v{model.version}")
+        return {
+            "results": results,
+            "model_version": str(model.version),
+            "num_drafts": len(self.drafts),
+            "elapsed_seconds": elapsed,
+            "drafts_per_second": len(self.drafts) / elapsed if elapsed > 0 else None,
+        }
+
+
+class TeamCompletionPipeline:
+    def __init__(self, model_name: str, allies: list[str], opponents: list[str], open_positions: list[str],
+                 bans: list[str] = None, registry: ModelRegistry = None, metadata_index: ChampionMetadataIndex = None,
+                 model_alias: str = PRODUCTION_ALIAS, model_version: str = None):
+        self.model_name = model_name
+        self.model_alias = model_alias
+        self.model_version = model_version
+        self.allies = allies
+        self.opponents = opponents
+        self.open_positions = open_positions
+        self.bans = bans if bans is not None else []
+        self.registry = registry if registry is not None else model_registry
+        self.metadata_index = metadata_index if metadata_index is not None else champion_metadata_index
+
+    def predict(self, top_k: int = 5, beam_width: int = 64, time_budget_ms: float = 250.0) -> dict:
+        model = self.registry.get(self.model_name, alias=self.model_alias, version=self.model_version)
+        completer = TeamCompleter(
+            recommender=model.recommender,
+            metadata=self.metadata_index.get(),
+            beam_width=beam_width,
+            time_budget_ms=time_budget_ms
+        )
+        result = completer.complete(
+            allies=self.allies,
+            opponents=self.opponents,
+            bans=self.bans,
+            open_positions=self.open_positions,
+            top_k=top_k
+        )
+        result["model_version"] = str(model.version)
+        return result
@@ -0,0 +1,169 @@
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, Optional, Tuple
+from io import BytesIO
+from loguru import logger
+import numpy as np
+from model_pipeline.training.actors.matrix_calculator import ChampionRelations, align_counts
+
+DATE_FORMAT = "%Y-%m-%d"
+
+
+def _to_date(value: str):
+    return datetime.strptime(value, DATE_FORMAT).date()
+
+
+def _to_str(value) -> str:
+    return value.strftime(DATE_FORMAT)
+
+
+class CountCube:
+    """
+    Cumulative prefix sums of the daily S/Ts/C/Tc counts.
+
+    cumulative[k] holds the summed counts of every day before start_date + k,
+    so the counts of any window [from_date, to_date] are two lookups and a
+    subtraction: cumulative[to + 1] - cumulative[from].
+
+    The warehouse match count of every day is recorded next to its counts, so
+    days that received late matches (or lost some) can be found and recounted.
+    """
+
+    def __init__(self, start_date: Optional[str], champions: list[str], cumulative: np.ndarray,
+                 match_counts: Optional[Dict[str, int]] = None):
+        """
+        Args:
+            start_date: First game_date covered by the cube (None when empty)
+            champions: Sorted champion names of the matrix axes
+            cumulative: (num_days + 1, 4, n, n) prefix sums of S, Ts, C, Tc
+            match_counts: game_date -> warehouse matches the day was counted from;
+                days without matches are omitted
+        """
+        self.start_date = start_date
+        self.champions = list(champions)
+        self.cumulative = cumulative
+        self.match_counts = dict(match_counts or {})
+
+    @classmethod
+    def empty(cls):
+        return cls(None, [], np.zeros((1, 4, 0, 0), dtype=np.int32))
+
+    @property
+    def num_days(self) -> int:
+        return len(self.cumulative) - 1
+
+    @property
+    def end_date(self) -> Optional[str]:
+        if self.start_date is None:
+            return None
+        return _to_str(_to_date(self.start_date) + timedelta(days=self.num_days - 1))
+
+    def covers(self, from_date: str, to_date: str) -> bool:
+        """Check whether every day of [from_date, to_date] is in the cube"""
+        if self.start_date is None:
+            return False
+        return self.start_date <= from_date and to_date <= self.end_date
+
+    def changed_days(self, match_counts: Dict[str, int], from_date: str, to_date: str) -> list[str]:
+        """
+        Days of [from_date, to_date] in the cube whose recorded match count differs from the warehouse.
+
+        Cubes written before match counts were recorded report every day with matches.
+
+        Args:
+            match_counts: game_date -> current warehouse matches; days without matches omitted
+        """
+        if self.start_date is None:
+            return []
+        start, end = max(from_date, self.start_date), min(to_date, self.end_date)
+        if start > end:
+            return []
+        days = [_to_str(_to_date(start) + timedelta(days=i)) for i in range((_to_date(end) - _to_date(start)).days + 1)]
+        return [day for day in days if match_counts.get(day, 0) != self.match_counts.get(day, 0)]
+
+    def _offset(self, value: str) -> int:
+        return (_to_date(value) - _to_date(self.start_date)).days
+
+    def window(self, from_date: str, to_date: str) -> ChampionRelations:
+        """
+        Get the raw counts of [from_date, to_date] as ChampionRelations.
+
+        Champions that did not play inside the window are dropped, so the result
+        matches counting the window's matches directly.
+        """
+        if not self.covers(from_date, to_date):
+            raise ValueError(
+                f"Count cube {self.start_date}..{self.end_date} does not cover {from_date}..{to_date}"
+            )
+        counts = self.cumulative[self._offset(to_date) + 1] - self.cumulative[self._offset(from_date)]
+        played = counts[3].sum(axis=1) > 0
+        champions = [c for c, p in zip(self.champions, played) if p]
+        counts = counts[:, played][:, :, played]
+        return ChampionRelations.from_counts(champions, *counts)
+
+    def add_days(self, daily: Iterable[Tuple[str, ChampionRelations]], from_date: str, to_date: str,
+                 match_counts: Optional[Dict[str, int]] = None) -> "CountCube":
+        """
+        Return a new cube extended to [from_date, to_date]; days already in the cube are replaced.
+
+        Each day is written into the cube as soon as it is read from daily, so
+        only the day in progress is held besides the cube itself.
+
+        Args:
+            daily: (game_date, ChampionRelations counted for that day only) pairs
+                inside [from_date, to_date], in any order
+            from_date: First day to cover even if it had no matches
+            to_date: Last day to cover even if it had no matches
+            match_counts: game_date -> warehouse matches the new days were counted from
+
+        Returns:
+            CountCube: Cube covering the union of the old and new days
+        """
+        start = _to_date(min(d for d in (from_date, self.start_date) if d))
+        end = _to_date(max(d for d in (to_date, self.end_date) if d))
+        champions = list(self.champions)
+        index = {c: i for i, c in enumerate(champions)}
+
+        days = np.zeros(((end - start).days + 1, 4, len(champions), len(champions)), dtype=np.int32)
+        if self.start_date is not None:
+            offset = (_to_date(self.start_date) - start).days
+            days[offset:offset + self.num_days] = np.diff(self.cumulative, axis=0)
+        for game_date, relations in daily:
+            if not from_date <= game_date <= to_date:
+                raise ValueError(f"Day {game_date} is outside the added days {from_date}..{to_date}")
+            relations.count()
+            if not index.keys() >= set(relations.champions):
+                grown = sorted(set(champions).union(relations.champions))
+                index = {c: i for i, c in enumerate(grown)}
+                days = align_counts(days, champions, index)
+                champions = grown
+            days[(_to_date(game_date) - start).days] = align_counts(
+                relations.get_counts(), relations.champions, index
+            )
+
+        size = len(champions)
+        cumulative = np.zeros((len(days) + 1, 4, size, size), dtype=np.int32)
+        np.cumsum(days, axis=0, out=cumulative[1:])
+        logger.info(f"Count cube now covers {_to_str(start)}..{_to_str(end)} for {size} champions")
+        recorded = {**self.match_counts, **(match_counts or {})}
+        return CountCube(_to_str(start), champions, cumulative, {d: n for d, n in recorded.items() if n})
+
+    def to_bytes(self) -> bytes:
+        buffer = BytesIO()
+        np.savez_compressed(
+            buffer,
+            start_date=np.array(self.start_date or ""),
+            champions=np.array(self.champions, dtype=str),
+            cumulative=self.cumulative,
+            count_dates=np.array(list(self.match_counts), dtype=str),
+            count_matches=np.array(list(self.match_counts.values()), dtype=np.int64),
+        )
+        return buffer.getvalue()
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> "CountCube":
+        with np.load(BytesIO(data)) as arrays:
+            start_date = str(arrays["start_date"]) or None
+            match_counts = {}
+            if "count_dates" in arrays.files:
+                match_counts = dict(zip(arrays["count_dates"].tolist(), arrays["count_matches"].tolist()))
+            return cls(start_date, arrays["champions"].tolist(), arrays["cumulative"], match_counts)
@@ -0,0 +1,115 @@
+from datetime import datetime
+from typing import Iterable, Optional, Tuple
+from io import BytesIO
+from loguru import logger
+import numpy as np
+from model_pipeline.training.actors.matrix_calculator import ChampionRelations, align_counts
+
+DATE_FORMAT = "%Y-%m-%d"
+
+
+class DecayedCounts:
+    """
+    Exponentially time-decayed S/Ts/C/Tc counts.
+
+    Folding in one day is counts = counts * decay + day_counts with
+    decay = 0.5 ** (1 / half_life_days), so a game played half_life_days before
+    as_of_date weighs half as much as one played on as_of_date.
+    """
+
+    def __init__(self, half_life_days: float, as_of_date: Optional[str], champions: list[str], counts: np.ndarray):
+        """
+        Args:
+            half_life_days: Age in days at which a game counts half
+            as_of_date: Last game_date folded into the counts (None when empty)
+            champions: Sorted champion names of the matrix axes
+            counts: (4, n, n) decayed S, Ts, C, Tc
+        """
+        self.half_life_days = half_life_days
+        self.as_of_date = as_of_date
+        self.champions = list(champions)
+        self.counts = counts
+
+    @classmethod
+    def empty(cls, half_life_days: float):
+        return cls(half_life_days, None, [], np.zeros((4, 0, 0)))
+
+    @property
+    def decay(self) -> float:
+        return 0.5 ** (1.0 / self.half_life_days)
+
+    def advance(self, daily: Iterable[Tuple[str, ChampionRelations]], to_date: str) -> "DecayedCounts":
+        """
+        Return new counts with every day up to to_date folded in.
+
+        Each day is folded in as soon as it is read from daily, so only the
+        day in progress is held besides the counts.
+
+        Args:
+            daily: (game_date, ChampionRelations counted for that day only) pairs in
+                game_date order; days up to as_of_date or after to_date are skipped
+            to_date: Last day to fold in; days without matches only decay
+
+        Returns:
+            DecayedCounts: Counts as of to_date
+        """
+        if self.as_of_date is not None and to_date <= self.as_of_date:
+            return self
+        champions = list(self.champions)
+        index = {c: i for i, c in enumerate(champions)}
+        counts = self.counts.astype(float)
+
+        decay = self.decay
+        # Last day whose decay is applied; before the first day the counts are all zero
+        last = None if self.as_of_date is None else datetime.strptime(self.as_of_date, DATE_FORMAT)
+        for game_date, relations in daily:
+            if (self.as_of_date is not None and game_date <= self.as_of_date) or game_date > to_date:
+                continue
+            day = datetime.strptime(game_date, DATE_FORMAT)
+            if last is not None:
+                if day <= last:
+                    raise ValueError(f"Days are not in game_date order: {game_date} after {last.strftime(DATE_FORMAT)}")
+                counts *= decay ** (day - last).days
+            last = day
+
+            relations.count()
+            if not index.keys() >= set(relations.champions):
+                grown = sorted(set(champions).union(relations.champions))
+                index = {c: i for i, c in enumerate(grown)}
+                counts = align_counts(counts, champions, index)
+                champions = grown
+            counts += align_counts(relations.get_counts(), relations.champions, index)
+
+        if last is not None:
+            counts *= decay ** (datetime.strptime(to_date, DATE_FORMAT) - last).days
+
+        logger.info(f"Decayed counts (half-life {self.half_life_days}d) now as of {to_date}")
+        return DecayedCounts(self.half_life_days, to_date, champions, counts)
+
+    def to_relations(self) -> ChampionRelations:
+        """Get the decayed counts as ChampionRelations for the usual ratio step"""
+        played = self.counts[3].sum(axis=1) > 0
+        champions = [c for c, p in zip(self.champions, played) if p]
+        counts = self.counts[:, played][:, :, played]
+        return ChampionRelations.from_counts(champions, *counts)
+
+    def to_bytes(self) -> bytes:
+        buffer = BytesIO()
+        np.savez_compressed(
+            buffer,
+            half_life_days=np.array(self.half_life_days),
+            as_of_date=np.array(self.as_of_date or ""),
+            champions=np.array(self.champions, dtype=str),
+            counts=self.counts,
+        )
+        return buffer.getvalue()
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> "DecayedCounts":
+        with np.load(BytesIO(data)) as arrays:
+            return cls(
+                float(arrays["half_life_days"]),
+                str(arrays["as_of_date"]) or None,
+                arrays["champions"].tolist(),
+                arrays["counts"],
+            )
@@ -0,0 +1,107 @@
+import numpy as np
+from loguru import logger
+from model_pipeline.training.actors.matrix_calculator import TEAM_SIZE
+
+# Cases scored per NumPy pass; bounds the (cases, champions) working arrays
+EVALUATION_CHUNK_SIZE = 4096
+
+
+class Evaluation:
+    def __init__(self, S, Ts, C, Tc):
+        """
+        Batched offline evaluation against relations learned from training data only.
+
+        Every team below is an int array of champion indices, one row per case.
+
+        Args:
+            S, Ts, C, Tc: Training count matrices (champion x champion)
+        """
+        Ts = np.asarray(Ts, dtype=float)
+        Tc = np.asarray(Tc, dtype=float)
+        self.synergy_matrix = np.divide(S, Ts, out=np.zeros_like(Ts), where=Ts != 0)
+        self.counter_matrix = np.divide(C, Tc, out=np.zeros_like(Tc), where=Tc != 0)
+        # Transposed so that row a holds the weight of every candidate against a
+        self.synergy_weight_t = (self.synergy_matrix * Ts).T
+        self.counter_weight_t = (self.counter_matrix * Tc).T
+        self.Ts_t = Ts.T
+        self.Tc_t = Tc.T
+
+    def compute_cwr(self, team_A: np.ndarray, team_O: np.ndarray) -> np.ndarray:
+        """Composite Win Rate of each team_A row against the team_O row"""
+        n_A, n_O = team_A.shape[1], team_O.shape[1]
+        i, j = np.triu_indices(n_A, k=1)
+        synergy_sum = self.synergy_matrix[team_A[:, i], team_A[:, j]].sum(axis=1)
+        counter_sum = self.counter_matrix[team_A[:, :, None], team_O[:, None, :]].sum(axis=(1, 2))
+        denominator = (n_A * (n_A - 1) / 2) + (n_A * n_O)
+        if denominator == 0:
+            return np.zeros(len(team_A))
+        return (synergy_sum + counter_sum) / denominator
+
+    def compute_upper_hand(self, team_A: np.ndarray, team_O: np.ndarray) -> np.ndarray:
+        """1 where team_A is predicted to win (higher CWR using train data)"""
+        return (self.compute_cwr(team_A, team_O) > self.compute_cwr(team_O, team_A)).astype(int)
+
+    def recommend(self, allies: np.ndarray, opponents: np.ndarray):
+        """
+        Best next pick per case with the ChampionRecommender.recommend_weighted formula.
+
+        Returns:
+            tuple: (recommended champion index, bool mask of cases with any candidate)
+        """
+        numerator = self.synergy_weight_t[allies].sum(axis=1) + self.counter_weight_t[opponents].sum(axis=1)
+        denominator = self.Ts_t[allies].sum(axis=1) + self.Tc_t[opponents].sum(axis=1)
+        score = np.divide(numerator, denominator, out=np.full_like(numerator, -np.inf), where=denominator != 0)
+        np.put_along_axis(score, allies, -np.inf, axis=1)
+        np.put_along_axis(score, opponents, -np.inf, axis=1)
+        # argmax keeps the first champion among ties, like the recommender's stable sort
+        recommended = score.argmax(axis=1)
+        return recommended, np.isfinite(score[np.arange(len(score)), recommended])
+
+    def evaluate(self, codes: np.ndarray) -> dict:
+        """
+        Score every held-out (partial team, opponents) case of the given matches.
+
+        Each match gives two perspectives and each perspective five cases, one
+        per removed ally; the removed champion is the pick to recover.
+
+        Args:
+            codes: (N, 10) champion indices, team1 slots first
+
+        Returns:
+            dict: evaluated_picks, avg_upper_hand, match_pick_accuracy, avg_cwr_gain
+        """
+        codes = np.asarray(codes, dtype=np.intp).reshape(-1, 2 * TEAM_SIZE)
+        team1, team2 = codes[:, :TEAM_SIZE], codes[:, TEAM_SIZE:]
+        allies_full = np.concatenate([team1, team2])
+        opponents_full = np.concatenate([team2, team1])
+
+        upper_hand, pick_hits, cwr_gain = [], [], []
+        for removed in range(TEAM_SIZE):
+            kept = [slot for slot in range(TEAM_SIZE) if slot != removed]
+            for start in range(0, len(allies_full), EVALUATION_CHUNK_SIZE):
+                chunk = slice(start, start + EVALUATION_CHUNK_SIZE)
+                allies = allies_full[chunk][:, kept]
+                opponents = opponents_full[chunk]
+                actual = allies_full[chunk][:, removed]
+
+                recommended, valid = self.recommend(allies, opponents)
+                allies, opponents = allies[valid], opponents[valid]
+                recommended, actual = recommended[valid], actual[valid]
+                allies_with_reco = np.column_stack([allies, recommended])
+
+                upper_hand.append(self.compute_upper_hand(allies_with_reco, opponents))
+                pick_hits.append((recommended == actual).astype(int))
+                cwr_gain.append(self.compute_cwr(allies_with_reco, opponents) - self.compute_cwr(allies, opponents))
+
+        upper_hand = np.concatenate(upper_hand) if upper_hand else np.zeros(0)
+        pick_hits = np.concatenate(pick_hits) if pick_hits else np.zeros(0)
+        cwr_gain = np.concatenate(cwr_gain) if cwr_gain else np.zeros(0)
+
+        results = {
+            "evaluated_picks": len(upper_hand),
+            "avg_upper_hand": float(upper_hand.mean()) if len(upper_hand) else float("nan"),
+            "match_pick_accuracy": float(pick_hits.mean()) if len(pick_hits) else float("nan"),
+            "avg_cwr_gain": float(cwr_gain.mean()) if len(cwr_gain) else float("nan"),
+        }
+        logger.info(f"Evaluation summary: {results}")
+        return results
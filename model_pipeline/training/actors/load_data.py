@@ -1,17 +1,142 @@
 from model_pipeline.utils.trino_operator import TrinoDBOperator
 from settings import settings
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+import queue
+import threading
 import trino
 from loguru import logger
 
+# The only columns the count engine reads; game_date is known per partition query
+MATCH_COLUMNS = ["team1_champions", "team2_champions", "team1_win"]
+# Batches a partition query may fetch ahead of the consumer
+PARTITION_PREFETCH_BATCHES = 1
+# Marks the end of a partition's batches
+_PARTITION_DONE = object()
+
 class DataLoader:
     def __init__(self, trino_connector: TrinoDBOperator):
         self.trino = trino_connector
+        self._local = threading.local()
+
+    def _thread_trino(self) -> TrinoDBOperator:
+        """The loader thread's own Trino connection, reused across partitions; self.trino outside a loader pool"""
+        return getattr(self._local, "trino", self.trino)
+
+    def _open_thread_trino(self, opened: list):
+        """Loader pool initializer: give the worker thread its own connection, closed with the pool"""
+        self._local.trino = TrinoDBOperator(schema=self.trino.schema)
+        opened.append(self._local.trino)
+
+    @staticmethod
+    def split_days(from_date: str, to_date: str) -> list[str]:
+        start = datetime.strptime(from_date, "%Y-%m-%d")
+        end = datetime.strptime(to_date, "%Y-%m-%d")
+        return [(start + timedelta(days=i)).strftime("%Y-%m-%d") for i in range((end - start).days + 1)]
+
+    def load_match_partition(self, game_date: str, batch_size: int = None):
+        """Stream the projected match records of a single date partition in batches of at most batch_size rows"""
+        query = (
+            f"SELECT {', '.join(MATCH_COLUMNS)} "
+            f"FROM {settings.WAREHOUSE_SCHEMA}.{settings.MATCHES_TABLE} WHERE date = ?"
+        )
+        batch_size = batch_size or settings.TRAINING_FETCH_BATCH_SIZE
+        for batch in self._thread_trino().iter_query(query, batch_size=batch_size, params=(game_date,)):
+            for row in batch:
+                row["game_date"] = game_date
+            yield batch
+
+    def count_match_partitions(self, from_date: str, to_date: str) -> dict[str, int]:
+        """Number of matches per date partition in [from_date, to_date]; partitions without matches are omitted"""
+        query = (
+            f"SELECT date, count(*) AS matches "
+            f"FROM {settings.WAREHOUSE_SCHEMA}.{settings.MATCHES_TABLE} WHERE date BETWEEN ? AND ? GROUP BY date"
+        )
+        return {str(row["date"]): row["matches"] for row in self.trino.execute_query(query, params=(from_date, to_date))}
 
     def load_match_data(self, from_date: str = None, to_date: str = None):
         logger.info(f"Loading match data from {from_date} to {to_date}")
-        query = f"SELECT * FROM {settings.WAREHOUSE_SCHEMA}.{settings.MATCHES_TABLE}"
-        if from_date and to_date:
-            query += f" WHERE game_date BETWEEN '{from_date}' AND '{to_date}'"
-        result = self.trino.execute_query(query)
+        result = [row for batch in self.iter_match_data(from_date, to_date) for row in batch]
         logger.info(f"Loaded {len(result)} match records")
         return result
+
+    def iter_match_data(self, from_date: str = None, to_date: str = None, batch_size: int = None,
+                        max_workers: int = None):
+        """
+        Yield match records in batches of at most batch_size rows.
+
+        A date range is split into per-partition queries run concurrently on a
+        bounded thread pool. Each query streams its partition with fetchmany and
+        waits while it is PARTITION_PREFETCH_BATCHES batches ahead of the
+        consumer, so at most max_workers partitions are in flight with a few
+        batches each, and they are yielded in date order.
+        """
+        batch_size = batch_size or settings.TRAINING_FETCH_BATCH_SIZE
+        max_workers = max_workers or settings.TRAINING_QUERY_WORKERS
+
+        if not (from_date and to_date):
+            logger.info(f"Streaming all match data in batches of {batch_size}")
+            query = (
+                f"SELECT {', '.join(MATCH_COLUMNS)}, game_date "
+                f"FROM {settings.WAREHOUSE_SCHEMA}.{settings.MATCHES_TABLE}"
+            )
+            yield from self.trino.iter_query(query, batch_size=batch_size)
+            return
+
+        days = self.split_days(from_date, to_date)
+        logger.info(f"Loading match data from {from_date} to {to_date} as {len(days)} partition queries "
+                    f"on {max_workers} workers")
+        opened = []
+        stopped = threading.Event()
+        try:
+            with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="match-loader",
+                                    initializer=self._open_thread_trino, initargs=(opened,)) as executor:
+                try:
+                    pending = deque()
+                    for day in days:
+                        batches = queue.Queue(maxsize=PARTITION_PREFETCH_BATCHES)
+                        future = executor.submit(self._stream_partition, day, batch_size, batches, stopped)
+                        pending.append((future, batches))
+                        if len(pending) >= max_workers:
+                            yield from self._drain_partition(*pending.popleft())
+                    while pending:
+                        yield from self._drain_partition(*pending.popleft())
+                finally:
+                    # Unblocks partition streams still waiting on a consumer that stopped early,
+                    # so the pool can shut down
+                    stopped.set()
+        finally:
+            # Also runs when the consumer stops iterating early
+            for trino_operator in opened:
+                trino_operator.close()
+
+    def _stream_partition(self, game_date: str, batch_size: int, batches: queue.Queue, stopped: threading.Event):
+        """Loader pool task: hand a partition's batches to the consumer, then _PARTITION_DONE"""
+        try:
+            for batch in self.load_match_partition(game_date, batch_size):
+                if not self._offer(batches, batch, stopped):
+                    return
+        finally:
+            self._offer(batches, _PARTITION_DONE, stopped)
+
+    @staticmethod
+    def _offer(batches: queue.Queue, item, stopped: threading.Event) -> bool:
+        """Put item once the consumer has room for it; False when the consumer stopped first"""
+        while not stopped.is_set():
+            try:
+                batches.put(item, timeout=0.5)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    @staticmethod
+    def _drain_partition(future, batches: queue.Queue):
+        """Yield a partition's batches as its query streams them; re-raises the query's error"""
+        while True:
+            batch = batches.get()
+            if batch is _PARTITION_DONE:
+                break
+            yield batch
+        future.result()
@@ -1,5 +1,89 @@
+from collections import defaultdict
 import numpy as np
-import itertools
+
+TEAM_SIZE = 5
+
+# Ordered (i, j) slot pairs inside one team, i != j -- the vectorized form of
+# itertools.permutations(team, 2).
+_SAME_TEAM_I, _SAME_TEAM_J = np.nonzero(~np.eye(TEAM_SIZE, dtype=bool))
+
+
+def encode_matches(matches):
+    """
+    Integer-encode matches for batched counting.
+
+    Args:
+        matches (list): A list of tuples (team1, team2, team1_win)
+
+    Returns:
+        tuple: (champions, codes, wins) where champions is the sorted champion
+            name list, codes is an (N, 10) int array of champion indices
+            (team1 slots first) and wins is an (N,) bool array of team1 wins.
+    """
+    names = np.array([champ for t1, t2, _ in matches for champ in t1 + t2], dtype=str)
+    champions, codes = np.unique(names, return_inverse=True)
+    codes = codes.reshape(len(matches), 2 * TEAM_SIZE)
+    wins = np.fromiter((win for _, _, win in matches), dtype=bool, count=len(matches))
+    return champions.tolist(), codes, wins
+
+
+def _same_team_counts(team, size):
+    """Count ordered ally pairs for an (N, 5) code array."""
+    flat = team[:, _SAME_TEAM_I] * size + team[:, _SAME_TEAM_J]
+    return np.bincount(flat.ravel(), minlength=size * size).reshape(size, size)
+
+
+def _cross_team_counts(left, right, size):
+    """Count (left, right) opponent pairs for two (N, 5) code arrays."""
+    flat = left[:, :, None] * size + right[:, None, :]
+    return np.bincount(flat.ravel(), minlength=size * size).reshape(size, size)
+
+
+def count_relations(codes, wins, size):
+    """
+    Build the raw S/Ts/C/Tc count matrices with bulk scatter-adds.
+
+    Args:
+        codes (np.ndarray): (N, 10) champion indices, team1 slots first
+        wins (np.ndarray): (N,) bool, True when team1 won
+        size (int): Number of champions
+
+    Returns:
+        tuple: (S, Ts, C, Tc) int matrices of shape (size, size)
+    """
+    codes = np.asarray(codes, dtype=np.int64).reshape(-1, 2 * TEAM_SIZE)
+    team1_win = np.asarray(wins, dtype=bool)[:, None]
+    team1, team2 = codes[:, :TEAM_SIZE], codes[:, TEAM_SIZE:]
+    winner = np.where(team1_win, team1, team2)
+    loser = np.where(team1_win, team2, team1)
+
+    S = _same_team_counts(winner, size)
+    Ts = S + _same_team_counts(loser, size)
+    C = _cross_team_counts(winner, loser, size)
+    # Every winner-vs-loser matchup is also a loser-vs-winner matchup
+    Tc = C + C.T
+    return S, Ts, C, Tc
+
+
+def align_counts(counts, champions, target_index):
+    """
+    Re-index stacked count matrices onto a larger champion axis.
+
+    Args:
+        counts (np.ndarray): (k, n, n) matrices indexed by champions
+        champions (list[str]): Champion names of the source axis
+        target_index (dict): Champion name -> index of the target axis
+
+    Returns:
+        np.ndarray: (k, m, m) matrices indexed by target_index
+    """
+    counts = np.asarray(counts)
+    size = len(target_index)
+    aligned = np.zeros(counts.shape[:-2] + (size, size), dtype=counts.dtype)
+    pos = np.array([target_index[c] for c in champions], dtype=np.intp)
+    aligned[..., pos[:, None], pos[None, :]] = counts
+    return aligned
+
 
 class ChampionRelations:
     def __init__(self, raw_matches):
@@ -10,8 +94,8 @@ class ChampionRelations:
             matches (list): A list of tuples (team1, team2, team1_win)
         """
         self.matches = self.process_matches(raw_matches)
-        # Build the full unique champion list
-        champions = sorted({champ for t1, t2, _ in self.matches for champ in t1 + t2})
+        # Build the full unique champion list and the integer-encoded matches
+        champions, self.codes, self.wins = encode_matches(self.matches)
         self.champ_index = {c: i for i, c in enumerate(champions)}
         self.champions = champions
 
@@ -22,6 +106,54 @@ class ChampionRelations:
         self.C = np.zeros((size, size), dtype=int)   # counter wins
         self.Tc = np.zeros((size, size), dtype=int)  # counter total
 
+    @classmethod
+    def from_counts(cls, champions, S, Ts, C, Tc):
+        """Build relations from precomputed counts, e.g. a CountCube window or decayed counts."""
+        relations = cls([])
+        relations.champions = list(champions)
+        relations.champ_index = {c: i for i, c in enumerate(relations.champions)}
+        relations.S, relations.Ts, relations.C, relations.Tc = (
+            np.array(m) for m in (S, Ts, C, Tc)
+        )
+        return relations
+
+    @classmethod
+    def from_batches(cls, batches):
+        """Count raw match batches one at a time so memory stays flat."""
+        relations = cls([])
+        for batch in batches:
+            relations = relations.merge(cls(batch))
+        return relations
+
+    @classmethod
+    def iter_daily(cls, batches):
+        """
+        Count raw match batches separately per game_date, yielding (game_date, relations)
+        as soon as a day's batches are finished.
+
+        Batches must arrive in game_date order, as DataLoader.iter_match_data yields
+        them, so only the day in progress is held.
+        """
+        current, relations = None, None
+        for batch in batches:
+            matches_by_date = defaultdict(list)
+            for match in batch:
+                matches_by_date[match["game_date"]].append(match)
+
+            for game_date in sorted(matches_by_date):
+                day = cls(matches_by_date[game_date])
+                day.count()
+                if game_date == current:
+                    relations = relations.merge(day)
+                    continue
+                if current is not None:
+                    if game_date < current:
+                        raise ValueError(f"Match batches are not in game_date order: {game_date} after {current}")
+                    yield current, relations
+                current, relations = game_date, day
+        if current is not None:
+            yield current, relations
+
     def process_matches(self, raw_matches):
         matches = []
         for match in raw_matches:
@@ -31,30 +163,41 @@ class ChampionRelations:
             matches.append((team1, team2, win))
         return matches
 
+    def count(self):
+        """Accumulate the encoded matches into S/Ts/C/Tc (only once)."""
+        if len(self.codes):
+            S, Ts, C, Tc = count_relations(self.codes, self.wins, len(self.champions))
+            self.S += S
+            self.Ts += Ts
+            self.C += C
+            self.Tc += Tc
+            self.codes, self.wins = self.codes[:0], self.wins[:0]
+            self.matches = []
+
+    def merge(self, other):
+        """Return a new ChampionRelations holding the summed counts of both."""
+        champions = sorted(set(self.champions) | set(other.champions))
+        index = {c: i for i, c in enumerate(champions)}
+        self.count()
+        other.count()
+        counts = (align_counts(self.get_counts(), self.champions, index)
+                  + align_counts(other.get_counts(), other.champions, index))
+        return ChampionRelations.from_counts(champions, *counts)
+
+    def prune(self, min_games):
+        """Drop synergy/counter cells backed by fewer than min_games games."""
+        self.count()
+        sparse_synergy = self.Ts < min_games
+        sparse_counter = self.Tc < min_games
+        self.S[sparse_synergy] = 0
+        self.Ts[sparse_synergy] = 0
+        # Tc is symmetric, so both sides of a dropped matchup go together
+        self.C[sparse_counter] = 0
+        self.Tc[sparse_counter] = 0
+
     def calculate(self):
         """Compute synergy and counter for all champion pairs."""
-        for team1, team2, team1_win in self.matches:
-            # Determine winner/loser teams
-            cwinner, closer = (team1, team2) if team1_win else (team2, team1)
-
-            # --- Synergy (same team) ---
-            for team in [cwinner, closer]:
-                for ca, cb in itertools.permutations(team, 2):
-                    a, b = self.champ_index[ca], self.champ_index[cb]
-                    self.Ts[a][b] += 1
-                    if team == cwinner:
-                        self.S[a][b] += 1
-
-            # --- Counter (winner vs loser) ---
-            for ca in cwinner:
-                for cb in closer:
-                    a, b = self.champ_index[ca], self.champ_index[cb]
-                    self.C[a][b] += 1  # winner beats loser
-                    self.Tc[a][b] += 1
-            for ca in closer:
-                for cb in cwinner:
-                    a, b = self.champ_index[ca], self.champ_index[cb]
-                    self.Tc[a][b] += 1  # total matchups
+        self.count()
 
         # Compute normalized matrices
         synergy = np.divide(self.S, self.Ts, out=np.zeros_like(self.S, dtype=float), where=self.Ts != 0)
@@ -79,3 +222,14 @@ class ChampionRelations:
 
     def get_ts_tc(self):
         return self.Ts, self.Tc
+
+    def get_counts(self):
+        return np.stack([self.S, self.Ts, self.C, self.Tc])
+
+    def get_num_matches(self):
+        # Every match adds TEAM_SIZE * TEAM_SIZE winner-vs-loser pairs to C
+        return int(self.C.sum()) // (TEAM_SIZE * TEAM_SIZE)
+
+    def get_match_weight(self):
+        """Total weight of the counted matches; below the match count when the counts are decayed"""
+        return float(self.C.sum()) / (TEAM_SIZE * TEAM_SIZE)
@@ -0,0 +1,78 @@
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime, timedelta
+import math
+import multiprocessing
+from loguru import logger
+from model_pipeline.training.actors.load_data import DataLoader
+from model_pipeline.training.actors.matrix_calculator import ChampionRelations
+from model_pipeline.utils.trino_operator import TrinoDBOperator
+from settings import settings
+
+# Shards per worker, so one slow partition range does not idle the others
+SHARDS_PER_WORKER = 4
+
+
+def _count_shard(from_date: str, to_date: str, daily: bool):
+    """Worker entry point: stream one date shard from Trino and count it"""
+    data_loader = DataLoader(trino_connector=TrinoDBOperator(schema=settings.WAREHOUSE_SCHEMA))
+    batches = data_loader.iter_match_data(from_date, to_date)
+    if daily:
+        return list(ChampionRelations.iter_daily(batches))
+    return ChampionRelations.from_batches(batches)
+
+
+class ParallelCounter:
+    """
+    Count a date range on a process pool.
+
+    The range is sharded into contiguous blocks of date partitions, every
+    worker returns partial S/Ts/C/Tc counts for its shard and the partials
+    are reduced by summation as they complete.
+    """
+
+    def __init__(self, num_workers: int):
+        self.num_workers = num_workers
+
+    def shards(self, from_date: str, to_date: str) -> list[tuple[str, str]]:
+        days = DataLoader.split_days(from_date, to_date)
+        shard_days = max(1, math.ceil(len(days) / (self.num_workers * SHARDS_PER_WORKER)))
+        return [(days[i], days[min(i + shard_days, len(days)) - 1]) for i in range(0, len(days), shard_days)]
+
+    def _run(self, from_date: str, to_date: str, daily: bool):
+        shards = self.shards(from_date, to_date)
+        logger.info(f"Counting {from_date}..{to_date} as {len(shards)} shards on {self.num_workers} processes")
+        # spawn: the API process runs threads (uvicorn, loader pools) that fork would copy mid-state
+        context = multiprocessing.get_context("spawn")
+        with ProcessPoolExecutor(max_workers=self.num_workers, mp_context=context) as executor:
+            if not daily:
+                # Sums do not care about order, and each partial is merged as it arrives
+                futures = [executor.submit(_count_shard, start, end, False) for start, end in shards]
+                for future in as_completed(futures):
+                    yield future.result()
+                return
+
+            # Per-day partials are consumed in date order, so a finished shard waits in this
+            # process for the ones before it; like iter_match_data, only num_workers are in flight
+            pending = deque()
+            for start, end in shards:
+                pending.append(executor.submit(_count_shard, start, end, True))
+                if len(pending) >= self.num_workers:
+                    yield pending.popleft().result()
+            while pending:
+                yield pending.popleft().result()
+
+    def count(self, from_date: str, to_date: str) -> ChampionRelations:
+        """Get the summed counts of every match in [from_date, to_date]"""
+        champion_relations = ChampionRelations([])
+        for partial in self._run(from_date, to_date, daily=False):
+            champion_relations = champion_relations.merge(partial)
+        return champion_relations
+
+    def iter_daily(self, from_date: str, to_date: str):
+        """Yield (game_date, counts) for the days of [from_date, to_date] with matches, in date order"""
+        for partial in self._run(from_date, to_date, daily=True):
+            # Shards are disjoint, consecutive date blocks; each day is dropped once handed over
+            partial.reverse()
+            while partial:
+                yield partial.pop()
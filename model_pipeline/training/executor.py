@@ -0,0 +1,187 @@
+from collections import deque
+from typing import Callable, Dict
+import multiprocessing
+import os
+import signal
+import threading
+from loguru import logger
+
+FINAL_STATUSES = {"completed", "failed", "cancelled"}
+
+
+class TrainingQueueFull(Exception):
+    """Raised when a job is submitted while the training queue is full"""
+
+
+def _run_job(target: Callable, job_id: str, updates, kwargs: dict):
+    """Worker process entry point: run target and forward its status reports"""
+    # Lead a process group of its own, so cancelling the job also reaches the
+    # pools it spawns (ParallelCounter) instead of orphaning them
+    os.setpgrp()
+
+    def report(**fields):
+        updates.put((job_id, fields))
+
+    try:
+        target(job_id=job_id, report=report, **kwargs)
+    except Exception as e:
+        report(status="failed", error=str(e))
+
+
+class TrainingExecutor:
+    """
+    Run training jobs in dedicated worker processes, away from the serving process.
+
+    Jobs wait in a FIFO queue until one of max_concurrent_jobs slots is free.
+    Each job gets its own spawned process leading its own process group, so
+    cancelling a running job is terminating that group. Workers report
+    status and progress through a multiprocessing queue that is applied to
+    the shared jobs dict.
+    """
+
+    def __init__(self, jobs: Dict[str, dict], max_concurrent_jobs: int = 1, max_queued_jobs: int = 16):
+        self.jobs = jobs
+        self.max_concurrent_jobs = max_concurrent_jobs
+        self.max_queued_jobs = max_queued_jobs
+        self._context = multiprocessing.get_context("spawn")
+        self._updates = None
+        self._pending = deque()
+        self._running = {}
+        # Cancelled processes being signalled and joined; they hold their slot until gone
+        self._stopping = {}
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stopped = threading.Event()
+        self._threads = []
+
+    def start(self):
+        self._updates = self._context.Queue()
+        self._stopped.clear()
+        self._threads = [
+            threading.Thread(target=self._dispatch_loop, name="training-dispatcher", daemon=True),
+            threading.Thread(target=self._listen_loop, name="training-listener", daemon=True),
+        ]
+        for thread in self._threads:
+            thread.start()
+        logger.info(f"Training executor started with {self.max_concurrent_jobs} worker slot(s)")
+
+    def shutdown(self):
+        self._stopped.set()
+        self._wakeup.set()
+        with self._lock:
+            for job_id in list(self._running):
+                self._stopping[job_id] = self._running.pop(job_id)
+            self._pending.clear()
+        for job_id in list(self._stopping):
+            self._terminate(job_id)
+        if self._updates is not None:
+            self._updates.put(None)
+        logger.info("Training executor stopped")
+
+    def submit(self, job_id: str, target: Callable, **kwargs):
+        """Queue target(job_id=..., report=..., **kwargs) to run in a worker process"""
+        with self._lock:
+            if len(self._pending) >= self.max_queued_jobs:
+                raise TrainingQueueFull(f"Training queue is full ({self.max_queued_jobs} jobs)")
+            self._pending.append((job_id, target, kwargs))
+            self.jobs[job_id].update({"status": "queued", "queue_position": len(self._pending)})
+        self._wakeup.set()
+
+    def cancel(self, job_id: str) -> bool:
+        """
+        Cancel a queued or running job; returns False if it already finished.
+
+        Stopping a running job blocks for up to 11 seconds, but without the
+        executor lock, so the dispatcher and status updates carry on meanwhile.
+        """
+        running = False
+        with self._lock:
+            for entry in self._pending:
+                if entry[0] == job_id:
+                    self._pending.remove(entry)
+                    self._update_queue_positions()
+                    break
+            else:
+                if job_id not in self._running:
+                    return False
+                self._stopping[job_id] = self._running.pop(job_id)
+                running = True
+            self.jobs[job_id].update({"status": "cancelled", "queue_position": None})
+        if running:
+            self._terminate(job_id)
+        logger.info(f"Cancelled training job {job_id}")
+        self._wakeup.set()
+        return True
+
+    def _terminate(self, job_id: str):
+        """Stop a process moved to _stopping and free its slot; called without the lock"""
+        process = self._stopping[job_id]
+        self._signal_group(process, signal.SIGTERM)
+        process.join(timeout=10)
+        # Pool workers may outlive the job process or ignore SIGTERM mid-query
+        self._signal_group(process, signal.SIGKILL)
+        process.join(timeout=1)
+        with self._lock:
+            del self._stopping[job_id]
+
+    @staticmethod
+    def _signal_group(process, signum: int):
+        try:
+            os.killpg(process.pid, signum)
+        except ProcessLookupError:
+            # The group is gone, or the worker was stopped before it created it
+            if process.is_alive():
+                os.kill(process.pid, signum)
+
+    def _update_queue_positions(self):
+        for position, (job_id, _, _) in enumerate(self._pending, start=1):
+            self.jobs[job_id]["queue_position"] = position
+
+    def _dispatch_loop(self):
+        while not self._stopped.is_set():
+            self._wakeup.wait(timeout=1.0)
+            self._wakeup.clear()
+            with self._lock:
+                # Reap finished workers; a crash without a final report marks the job failed
+                for job_id, process in list(self._running.items()):
+                    if process.is_alive():
+                        continue
+                    del self._running[job_id]
+                    if self.jobs[job_id].get("status") not in FINAL_STATUSES and process.exitcode != 0:
+                        self.jobs[job_id].update({
+                            "status": "failed",
+                            "error": f"Training worker exited with code {process.exitcode}"
+                        })
+
+                while self._pending and len(self._running) + len(self._stopping) < self.max_concurrent_jobs:
+                    job_id, target, kwargs = self._pending.popleft()
+                    process = self._context.Process(
+                        target=_run_job,
+                        args=(target, job_id, self._updates, kwargs),
+                        name=f"training-{job_id}",
+                        daemon=False
+                    )
+                    try:
+                        process.start()
+                    except Exception as e:
+                        logger.error(f"Could not start training job {job_id}: {e}")
+                        self.jobs[job_id].update({"status": "failed", "error": str(e), "queue_position": None})
+                        continue
+                    self._running[job_id] = process
+                    self.jobs[job_id].update({"status": "starting", "queue_position": None})
+                    logger.info(f"Started training job {job_id} in process {process.pid}")
+                self._update_queue_positions()
+
+    def _listen_loop(self):
+        while True:
+            message = self._updates.get()
+            if message is None:
+                return
+            job_id, fields = message
+            with self._lock:
+                job = self.jobs.get(job_id)
+                if job is None or job.get("status") == "cancelled":
+                    continue
+                job.update(fields)
+            if fields.get("status") in FINAL_STATUSES:
+                self._wakeup.set()
@@ -1,19 +1,45 @@
 
 
 from model_pipeline.training.actors.load_data import DataLoader
+from model_pipeline.training.actors.evaluation import Evaluation
 from model_pipeline.utils.trino_operator import TrinoDBOperator
-from model_pipeline.utils.s3_operator import S3Operator
-from model_pipeline.training.actors.matrix_calculator import ChampionRelations
+from model_pipeline.utils.s3_operator import S3Operator, shared_s3_operator
+from model_pipeline.utils.relations_artifact import ARTIFACT_EXTENSION, dump_relations_artifact
+from model_pipeline.training.actors.matrix_calculator import ChampionRelations, align_counts
+from model_pipeline.training.actors.count_cube import CountCube
+from model_pipeline.training.actors.decayed_counts import DecayedCounts
+from model_pipeline.training.actors.parallel_counter import ParallelCounter
 from settings import settings
-from datetime import datetime
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from loguru import logger
+import fcntl
+import os
 import numpy as np
 import mlflow
 
+COUNT_CUBE_KEY = "model_artifacts/count_cube/champion_counts.npz"
+# Partitions younger than this still receive most late matches, so they are
+# counted on every run instead of being stored in the count cube. Older days
+# are recounted only when their warehouse match count changes.
+COUNT_CUBE_SEAL_DAYS = 2
+# Read-modify-write retries of persisted state when another job wrote it meanwhile
+STATE_WRITE_ATTEMPTS = 3
+DECAYED_COUNTS_KEY = "model_artifacts/decayed_counts/half_life={half_life_days}/champion_counts.npz"
+
 class TrainingPipeline:
-    def __init__(self, training_start_date: str, training_end_date: str=None):
+    def __init__(self, training_start_date: str, training_end_date: str=None, use_count_cube: bool = True,
+                 half_life_days: float = None, min_games: int = 0, num_workers: int = None):
         self.data_loader = self.connect_data_loader()
         self.training_start_date = training_start_date
         self.training_end_date = datetime.now().strftime("%Y-%m-%d") if training_end_date is None else training_end_date
+        self.use_count_cube = use_count_cube
+        # When set, train on exponentially decayed counts instead of a hard window
+        self.half_life_days = half_life_days
+        # Relation cells backed by fewer games are dropped from the model
+        self.min_games = min_games
+        # More than one worker counts date shards on a process pool
+        self.num_workers = num_workers or settings.TRAINING_PROCESS_WORKERS
 
     def connect_data_loader(self) -> DataLoader:
         trino_operator = TrinoDBOperator(schema=settings.WAREHOUSE_SCHEMA)
@@ -23,14 +49,239 @@ class TrainingPipeline:
     def fetch_match_data(self):
         return self.data_loader.load_match_data(self.training_start_date, self.training_end_date)
 
+    def load_match_batches(self, from_date: str, to_date: str):
+        return self.data_loader.iter_match_data(from_date, to_date)
+
+    def count_window(self, from_date: str, to_date: str) -> ChampionRelations:
+        """Count every match in [from_date, to_date], sharded across processes if configured"""
+        if self.num_workers > 1:
+            return ParallelCounter(self.num_workers).count(from_date, to_date)
+        return ChampionRelations.from_batches(self.load_match_batches(from_date, to_date))
+
+    def iter_days(self, from_date: str, to_date: str):
+        """
+        Count [from_date, to_date] separately per game_date, sharded across processes if configured.
+
+        Yields (game_date, ChampionRelations) in date order for the days with matches.
+        """
+        if self.num_workers > 1:
+            return ParallelCounter(self.num_workers).iter_daily(from_date, to_date)
+        return self.iter_daily(self.load_match_batches(from_date, to_date))
+
     def preprocess_data(self, raw_data):
         # Implement preprocessing logic here
         champion_relations = ChampionRelations(raw_data)
+        return self.build_result(champion_relations)
+
+    def _sealed_end_date(self) -> str:
+        """Last game_date old enough to be persisted in the count cube or decayed counts"""
+        sealed = (datetime.now() - timedelta(days=COUNT_CUBE_SEAL_DAYS)).strftime("%Y-%m-%d")
+        return min(self.training_end_date, sealed)
+
+    @staticmethod
+    def _next_day(value: str) -> str:
+        return (datetime.strptime(value, "%Y-%m-%d") + timedelta(days=1)).strftime("%Y-%m-%d")
+
+    def load_relations(self) -> ChampionRelations:
+        """Get counted ChampionRelations for the training window, via the count cube if enabled"""
+        if self.half_life_days is not None:
+            return self.load_decayed_relations()
+
+        if not self.use_count_cube:
+            return self.count_window(self.training_start_date, self.training_end_date)
+
+        sealed_end = self._sealed_end_date()
+        champion_relations = ChampionRelations([])
+
+        if self.training_start_date <= sealed_end:
+            cube = self.update_count_cube(self.training_start_date, sealed_end)
+            champion_relations = cube.window(self.training_start_date, sealed_end)
+            live_start = self._next_day(sealed_end)
+        else:
+            live_start = self.training_start_date
+
+        if live_start <= self.training_end_date:
+            live_relations = self.count_window(live_start, self.training_end_date)
+            champion_relations = champion_relations.merge(live_relations)
+        return champion_relations
+
+    def load_decayed_relations(self) -> ChampionRelations:
+        """
+        Get exponentially decayed ChampionRelations as of training_end_date.
+
+        The persisted decayed counts only need the days since their as_of_date,
+        so a daily refresh scans a single partition. training_start_date is where
+        the counts are bootstrapped when nothing has been persisted yet.
+        """
+        sealed_end = self._sealed_end_date()
+        key = DECAYED_COUNTS_KEY.format(half_life_days=self.half_life_days)
+        with self._state_lock(key):
+            state = self._fold_decayed_counts(sealed_end)
+
+        live_start = self.training_start_date if state.as_of_date is None else self._next_day(state.as_of_date)
+        if live_start <= self.training_end_date:
+            state = state.advance(self.iter_days(live_start, self.training_end_date), self.training_end_date)
+        return state.to_relations()
+
+    def _fold_decayed_counts(self, sealed_end: str) -> DecayedCounts:
+        """Advance the persisted decayed counts up to sealed_end and persist them; the caller holds the state lock"""
+        state, etag = self.load_decayed_counts() or (None, None)
+        # Backfills that end before the persisted counts are recounted without overwriting them
+        persist = state is None or state.as_of_date <= sealed_end
+        if not persist:
+            logger.warning(f"Decayed counts are as of {state.as_of_date}, recounting up to {self.training_end_date}")
+        if state is None or not persist:
+            state = DecayedCounts.empty(self.half_life_days)
+
+        fold_start = self.training_start_date if state.as_of_date is None else self._next_day(state.as_of_date)
+        if fold_start <= sealed_end:
+            state = state.advance(self.iter_days(fold_start, sealed_end), sealed_end)
+            if persist:
+                self.save_decayed_counts(state, etag)
+        return state
+
+    def iter_daily(self, batches):
+        """Count date-ordered batches of raw matches separately per game_date, yielding each finished day"""
+        return ChampionRelations.iter_daily(batches)
+
+    def update_count_cube(self, from_date: str, to_date: str) -> CountCube:
+        """
+        Load the persisted count cube and count only the days it is missing or whose matches changed.
+
+        The update runs under a host-wide lock, and the cube is only written
+        back while its ETag is still the one it was read at; otherwise the
+        update is redone on the newer cube, so concurrent jobs keep each
+        other's days.
+        """
+        with self._state_lock(COUNT_CUBE_KEY):
+            for _ in range(STATE_WRITE_ATTEMPTS):
+                cube, etag = self.load_count_cube() or (CountCube.empty(), None)
+                updated = self._extend_count_cube(cube, from_date, to_date)
+                if updated is cube:
+                    return cube
+                if self.get_s3_operator().get_etag(COUNT_CUBE_KEY) == etag:
+                    self.save_count_cube(updated)
+                    return updated
+                logger.warning(f"Count cube at {COUNT_CUBE_KEY} changed while updating it, retrying")
+        raise RuntimeError(f"Count cube at {COUNT_CUBE_KEY} kept changing during {STATE_WRITE_ATTEMPTS} updates")
+
+    def _extend_count_cube(self, cube: CountCube, from_date: str, to_date: str) -> CountCube:
+        """Cube with the missing and changed days of [from_date, to_date] counted; cube itself if none"""
+        # Taken before counting: matches landing meanwhile make the day differ next run, never the reverse
+        match_counts = self.data_loader.count_match_partitions(from_date, to_date)
+        changed = cube.changed_days(match_counts, from_date, to_date)
+        if cube.covers(from_date, to_date) and not changed:
+            logger.info(f"Count cube covers {from_date}..{to_date}, no recount needed")
+            return cube
+
+        missing = []
+        if cube.start_date is None:
+            missing.append((from_date, to_date))
+        else:
+            if from_date < cube.start_date:
+                day_before = datetime.strptime(cube.start_date, "%Y-%m-%d") - timedelta(days=1)
+                missing.append((from_date, day_before.strftime("%Y-%m-%d")))
+            if to_date > cube.end_date:
+                day_after = datetime.strptime(cube.end_date, "%Y-%m-%d") + timedelta(days=1)
+                missing.append((day_after.strftime("%Y-%m-%d"), to_date))
+        if changed:
+            logger.info(f"Recounting {len(changed)} count cube days whose matches changed: {changed}")
+            missing.extend(self._day_runs(changed))
+
+        counted = [day for missing_start, missing_end in missing
+                   for day in DataLoader.split_days(missing_start, missing_end)]
+        return cube.add_days(self._iter_missing_days(missing, changed, match_counts),
+                             from_date=from_date, to_date=to_date,
+                             match_counts={day: match_counts.get(day, 0) for day in counted})
+
+    def _iter_missing_days(self, missing: list[tuple], changed: list[str], match_counts: dict):
+        """Stream the per-day counts of the missing ranges, so the cube takes each day as it is counted"""
+        for day in changed:
+            if not match_counts.get(day):
+                # A day whose matches were all removed is recounted to zero
+                yield day, ChampionRelations([])
+        for missing_start, missing_end in missing:
+            logger.info(f"Counting days {missing_start}..{missing_end} into count cube")
+            yield from self.iter_days(missing_start, missing_end)
+
+    @staticmethod
+    def _day_runs(days: list[str]) -> list[tuple]:
+        """Group sorted days into (first, last) runs of consecutive days"""
+        runs = []
+        for day in days:
+            if runs and TrainingPipeline._next_day(runs[-1][1]) == day:
+                runs[-1] = (runs[-1][0], day)
+            else:
+                runs.append((day, day))
+        return runs
+
+    @contextmanager
+    def _state_lock(self, key: str):
+        """Exclusive lock between training jobs on this host around the update of persisted state at key"""
+        os.makedirs(settings.TRAINING_STATE_LOCK_DIR, exist_ok=True)
+        path = os.path.join(settings.TRAINING_STATE_LOCK_DIR, key.replace("/", "_") + ".lock")
+        with open(path, "w") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def load_count_cube(self):
+        """
+        Returns:
+            Tuple: (CountCube, ETag) or None when no cube was persisted yet; raises when S3 fails
+        """
+        loaded = self.get_s3_operator().download_versioned(key=COUNT_CUBE_KEY)
+        if loaded is None:
+            logger.warning(f"No count cube found at {COUNT_CUBE_KEY}")
+            return None
+        data, etag = loaded
+        return CountCube.from_bytes(data), etag
+
+    def save_count_cube(self, cube: CountCube):
+        saved = self.get_s3_operator().upload_fileobj(
+            key=COUNT_CUBE_KEY,
+            fileobj=cube.to_bytes(),
+            content_type="application/octet-stream"
+        )
+        if not saved:
+            raise RuntimeError(f"Failed to save count cube to {COUNT_CUBE_KEY}")
+
+    def load_decayed_counts(self):
+        """
+        Returns:
+            Tuple: (DecayedCounts, ETag) or None when nothing was persisted yet; raises when S3 fails
+        """
+        key = DECAYED_COUNTS_KEY.format(half_life_days=self.half_life_days)
+        loaded = self.get_s3_operator().download_versioned(key=key)
+        if loaded is None:
+            logger.warning(f"No decayed counts found at {key}")
+            return None
+        data, etag = loaded
+        return DecayedCounts.from_bytes(data), etag
+
+    def save_decayed_counts(self, state: DecayedCounts, etag: str = None):
+        """Persist state unless the stored counts changed since they were read at etag (None: absent)"""
+        key = DECAYED_COUNTS_KEY.format(half_life_days=self.half_life_days)
+        s3_operator = self.get_s3_operator()
+        if s3_operator.get_etag(key) != etag:
+            # Another job advanced the counts meanwhile; its state is kept and this run's is only used
+            logger.warning(f"Decayed counts at {key} changed while advancing them, not overwriting")
+            return
+        if not s3_operator.upload_fileobj(key=key, fileobj=state.to_bytes(), content_type="application/octet-stream"):
+            raise RuntimeError(f"Failed to save decayed counts to {key}")
+
+    def build_result(self, champion_relations: ChampionRelations):
+        if self.min_games:
+            champion_relations.prune(self.min_games)
         synergy_matrix, counter_matrix = champion_relations.calculate()
         champion_index = champion_relations.get_champ_index()
         ts, tc = champion_relations.get_ts_tc()
 
         result = {
+            "S": champion_relations.S,
+            "C": champion_relations.C,
             "Ts": ts,
             "Tc": tc,
             "synergy_matrix": synergy_matrix,
@@ -39,28 +290,43 @@ class TrainingPipeline:
         }
         return result
 
+    def get_s3_operator(self) -> S3Operator:
+        return shared_s3_operator(bucket_name=settings.S3_DATA_BUCKET,
+                                  endpoint=settings.S3_ENDPOINT,
+                                  access_key=settings.S3_ACCESS_KEY,
+                                  secret_key=settings.S3_SECRET_KEY,
+                                  secure=False)
+
     def save_result_to_s3(self, result, key):
-        s3_operator = S3Operator(bucket_name=settings.S3_DATA_BUCKET,
-                                 endpoint=settings.S3_ENDPOINT,
-                                 access_key=settings.S3_ACCESS_KEY,
-                                 secret_key=settings.S3_SECRET_KEY,
-                                 secure=False)
-        serializable_result = self._convert_numpy_to_serializable(result)
-        s3_operator.upload_json(data=serializable_result, key=key)
-
-    def _convert_numpy_to_serializable(self, obj):
-        """Convert numpy arrays to lists for JSON serialization"""
-        if isinstance(obj, np.ndarray):
-            return obj.tolist()
-        elif isinstance(obj, dict):
-            return {key: self._convert_numpy_to_serializable(value) for key, value in obj.items()}
-        elif isinstance(obj, list):
-            return [self._convert_numpy_to_serializable(item) for item in obj]
-        elif isinstance(obj, (np.int64, np.int32)):
-            return int(obj)
-        elif isinstance(obj, (np.float64, np.float32)):
-            return float(obj)
-        return obj
+        s3_operator = self.get_s3_operator()
+        s3_operator.upload_fileobj(
+            key=key,
+            fileobj=dump_relations_artifact(result, metadata=self.artifact_metadata()),
+            content_type="application/octet-stream",
+            compression=settings.S3_COMPRESSION
+        )
+
+    def count_matches(self, champion_relations: ChampionRelations) -> int:
+        """
+        Number of matches in the training window.
+
+        Decayed counts are weighted sums, so in decayed mode the matches are
+        counted in the warehouse instead of derived from the counts.
+        """
+        if self.half_life_days is None:
+            return champion_relations.get_num_matches()
+        return sum(self.data_loader.count_match_partitions(self.training_start_date, self.training_end_date).values())
+
+    def artifact_metadata(self) -> dict:
+        return {
+            "training_start_date": self.training_start_date,
+            "training_end_date": self.training_end_date,
+            "half_life_days": self.half_life_days,
+            "min_games": self.min_games
+        }
+
+    def artifact_key(self) -> str:
+        return f"model_artifacts/{self.training_start_date}/champion_relations{ARTIFACT_EXTENSION}"
 
     def split_data(self, data, validation_ratio=0.2):
         # Implement data splitting logic here
@@ -69,10 +335,59 @@ class TrainingPipeline:
         validation_data = data[split_index:]
         return training_data, validation_data
 
+    def _day_weight(self, game_date: str) -> float:
+        """Weight of a day's counts in the loaded relations (decay factor in decayed mode)"""
+        if self.half_life_days is None:
+            return 1.0
+        age = (datetime.strptime(self.training_end_date, "%Y-%m-%d") - datetime.strptime(game_date, "%Y-%m-%d")).days
+        return 0.5 ** (age / self.half_life_days)
+
+    def evaluate(self, champion_relations: ChampionRelations, validation_ratio: float = 0.2) -> dict:
+        """
+        Time-based holdout evaluation of the trained relations.
+
+        The last validation_ratio of the window's days are held out. Their counts
+        are subtracted from champion_relations (decay-weighted in decayed mode), so
+        the evaluated matrices never saw the held-out matches.
+        """
+        days = DataLoader.split_days(self.training_start_date, self.training_end_date)
+        _, holdout_days = self.split_data(days, validation_ratio)
+        if not holdout_days:
+            return {"holdout_matches": 0, "evaluated_picks": 0}
+        logger.info(f"Evaluating on holdout days {holdout_days[0]}..{holdout_days[-1]}")
+
+        champion_relations.count()
+        index = champion_relations.get_champ_index()
+        holdout_counts = np.zeros(champion_relations.get_counts().shape)
+        holdout_codes = []
+        for batch in self.load_match_batches(holdout_days[0], holdout_days[-1]):
+            batch_relations = ChampionRelations(batch)
+            remap = np.array([index.get(c, -1) for c in batch_relations.champions], dtype=np.intp)
+            codes = remap[batch_relations.codes]
+            # Champions outside the trained index cannot be scored or subtracted
+            known = (codes >= 0).all(axis=1)
+            holdout_codes.append(codes[known])
+            known_batch = [match for match, is_known in zip(batch, known) if is_known]
+            for game_date, daily in ChampionRelations.iter_daily([known_batch]):
+                holdout_counts += self._day_weight(game_date) * align_counts(daily.get_counts(), daily.champions, index)
+
+        train_counts = np.clip(champion_relations.get_counts() - holdout_counts, 0, None)
+        train_relations = ChampionRelations.from_counts(champion_relations.champions, *train_counts)
+        if self.min_games:
+            train_relations.prune(self.min_games)
+
+        codes = np.concatenate(holdout_codes) if holdout_codes else np.zeros((0, 10), dtype=np.intp)
+        # Only matches whose champions all have training games can be scored
+        played = train_relations.Tc.sum(axis=1) > 0
+        codes = codes[played[codes].all(axis=1)]
+
+        metrics = Evaluation(*train_relations.get_counts()).evaluate(codes)
+        metrics["holdout_matches"] = len(codes)
+        return metrics
+
     def run(self):
-        raw_data = self.fetch_match_data()
-        processed_data = self.preprocess_data(raw_data)
+        champion_relations = self.load_relations()
+        processed_data = self.build_result(champion_relations)
 
-        key = f"model_artifacts/{self.training_start_date}/champion_relations.json"
-        self.save_result_to_s3(processed_data, key=key)
+        self.save_result_to_s3(processed_data, key=self.artifact_key())
         return processed_data
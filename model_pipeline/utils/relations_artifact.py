@@ -0,0 +1,214 @@
+"""
+Binary champion relations artifact.
+
+Layout (little endian):
+    8 bytes   magic b"CHRELART"
+    uint32    format version
+    uint32    header length
+    header    UTF-8 JSON: {"arrays": {name: {"dtype", "shape", "offset"}}, "metadata": {...}}
+    arrays    raw C-order array data, each starting on an ALIGNMENT boundary
+
+Every array is a plain view into the file, so the artifact can be served
+straight from bytes or a read-only memory map without parsing or copying.
+
+Version 1 stores the dense Ts/Tc/synergy/counter matrices. Version 2 stores
+the relations compactly: Ts, S and Tc are symmetric and C[b, a] equals
+Tc[a, b] - C[a, b], so only the non-empty upper-triangle cells of the game
+and win counts are kept and the ratios are derived when loading.
+
+pack_arrays/unpack_arrays implement the container itself and are reused,
+under another magic, for the serving images shared between API workers.
+"""
+import json
+import mmap
+import struct
+from typing import Dict, Optional, Tuple, Union
+import numpy as np
+
+ARTIFACT_MAGIC = b"CHRELART"
+ARTIFACT_VERSION = 2
+SUPPORTED_VERSIONS = (1, 2)
+ARTIFACT_EXTENSION = ".bin"
+ALIGNMENT = 64
+
+_PREAMBLE = struct.Struct("<8sII")
+
+
+def _narrow_counts(matrix: np.ndarray) -> np.ndarray:
+    """Store counts in the narrowest unsigned integer type, decayed (fractional) counts as float32"""
+    matrix = np.asarray(matrix)
+    if matrix.size and not np.array_equal(matrix, np.round(matrix)):
+        return matrix.astype(np.float32)
+    max_count = int(matrix.max()) if matrix.size else 0
+    return matrix.astype(np.promote_types(np.min_scalar_type(max_count), np.uint8))
+
+
+def _pad(size: int) -> int:
+    return (ALIGNMENT - size % ALIGNMENT) % ALIGNMENT
+
+
+def compact_relations(S, Ts, C, Tc) -> Dict[str, np.ndarray]:
+    """
+    Keep only the non-empty upper-triangle cells of the count matrices.
+
+    Returns:
+        Dict: synergy_rows/cols/games/wins for the Ts and S cells and
+            counter_rows/cols/games/wins for the Tc and C cells (row <= col)
+    """
+    Ts, S, Tc, C = (np.asarray(m) for m in (Ts, S, Tc, C))
+    size = len(Ts)
+    rows, cols = np.triu_indices(size)
+    index_dtype = np.promote_types(np.min_scalar_type(max(size - 1, 0)), np.uint8)
+
+    compact = {}
+    for prefix, games, wins in (("synergy", Ts, S), ("counter", Tc, C)):
+        keep = games[rows, cols] != 0
+        r, c = rows[keep], cols[keep]
+        compact[f"{prefix}_rows"] = r.astype(index_dtype)
+        compact[f"{prefix}_cols"] = c.astype(index_dtype)
+        compact[f"{prefix}_games"] = _narrow_counts(games[r, c])
+        compact[f"{prefix}_wins"] = _narrow_counts(wins[r, c])
+    return compact
+
+
+def expand_relations(compact: Dict[str, np.ndarray], size: int):
+    """
+    Rebuild dense (S, Ts, C, Tc) from compact_relations output.
+
+    Integer counts come back as int64 and decayed counts as float64.
+    """
+    dense = []
+    for prefix in ("synergy", "counter"):
+        r = compact[f"{prefix}_rows"].astype(np.intp)
+        c = compact[f"{prefix}_cols"].astype(np.intp)
+        games, wins = compact[f"{prefix}_games"], compact[f"{prefix}_wins"]
+        dtype = np.result_type(games.dtype, wins.dtype, np.int64)
+        total = np.zeros((size, size), dtype=dtype)
+        won = np.zeros((size, size), dtype=dtype)
+        total[r, c] = games
+        total[c, r] = games
+        won[r, c] = wins
+        if prefix == "synergy":
+            won[c, r] = wins
+        else:
+            # The other side of a matchup wins whatever this side lost
+            won[c, r] = games.astype(dtype) - wins
+        dense.extend([won, total])
+    S, Ts, C, Tc = dense
+    return S, Ts, C, Tc
+
+
+def to_artifact_arrays(relations: Dict) -> Dict[str, np.ndarray]:
+    """Convert a training result dict into the typed arrays stored in the artifact"""
+    champion_index = relations["champion_index"]
+    champions = sorted(champion_index, key=champion_index.get)
+    arrays = {"champions": np.array(champions, dtype=str)}
+    arrays.update(compact_relations(relations["S"], relations["Ts"], relations["C"], relations["Tc"]))
+    return arrays
+
+
+def pack_arrays(arrays: Dict[str, np.ndarray], metadata: Optional[Dict] = None,
+                magic: bytes = ARTIFACT_MAGIC, version: int = ARTIFACT_VERSION) -> bytes:
+    """Lay out named arrays and a JSON metadata header in the container format described above"""
+    # Offsets depend on the header length, which depends on the offsets: grow
+    # the data start until the header fits in front of it.
+    layout, position = {}, 0
+    for name, array in arrays.items():
+        layout[name] = (array.dtype.str, list(array.shape), position)
+        position += array.nbytes + _pad(array.nbytes)
+
+    data_start = 0
+    while True:
+        header = {
+            "arrays": {
+                name: {"dtype": dtype, "shape": shape, "offset": data_start + offset}
+                for name, (dtype, shape, offset) in layout.items()
+            },
+            "metadata": metadata or {},
+        }
+        header_bytes = json.dumps(header).encode("utf-8")
+        needed = _PREAMBLE.size + len(header_bytes)
+        needed += _pad(needed)
+        if needed <= data_start:
+            break
+        data_start = needed
+    header_bytes = header_bytes.ljust(data_start - _PREAMBLE.size, b" ")
+
+    parts = [_PREAMBLE.pack(magic, version, len(header_bytes)), header_bytes]
+    for array in arrays.values():
+        raw = np.ascontiguousarray(array).tobytes()
+        parts.extend([raw, b"\0" * _pad(len(raw))])
+    return b"".join(parts)
+
+
+def unpack_arrays(source: Union[bytes, bytearray, memoryview, mmap.mmap, str], magic: bytes = ARTIFACT_MAGIC,
+                  versions: tuple = SUPPORTED_VERSIONS) -> Tuple[int, Dict[str, np.ndarray], Dict]:
+    """
+    Zero-copy views of the arrays in a pack_arrays container.
+
+    Args:
+        source: Container bytes (or any buffer), or a file path to memory-map read-only
+
+    Returns:
+        Tuple: format version, {name: array} and the metadata dict
+    """
+    if isinstance(source, str):
+        with open(source, "rb") as f:
+            source = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    buffer = memoryview(source)
+    found, version, header_length = _PREAMBLE.unpack_from(buffer, 0)
+    if found != magic:
+        raise ValueError(f"Bad magic {found!r}, expected {magic!r}")
+    if version not in versions:
+        raise ValueError(f"Unsupported artifact version {version}, expected one of {versions}")
+    header = json.loads(bytes(buffer[_PREAMBLE.size:_PREAMBLE.size + header_length]))
+
+    arrays = {}
+    for name, entry in header["arrays"].items():
+        dtype = np.dtype(entry["dtype"])
+        count = int(np.prod(entry["shape"], dtype=np.int64))
+        array = np.frombuffer(buffer, dtype=dtype, count=count, offset=entry["offset"])
+        arrays[name] = array.reshape(entry["shape"])
+    return version, arrays, header["metadata"]
+
+
+def dump_relations_artifact(relations: Dict, metadata: Optional[Dict] = None) -> bytes:
+    """
+    Serialize a training result dict (S, Ts, C, Tc, champion_index) into the
+    compact binary artifact format.
+    """
+    return pack_arrays(to_artifact_arrays(relations), metadata=metadata)
+
+
+def write_relations_artifact(relations: Dict, path: str, metadata: Optional[Dict] = None) -> str:
+    with open(path, "wb") as f:
+        f.write(dump_relations_artifact(relations, metadata=metadata))
+    return path
+
+
+def read_relations_artifact(source: Union[bytes, bytearray, memoryview, mmap.mmap, str]) -> Dict:
+    """
+    Read a binary artifact into a relations dict.
+
+    Version 1 arrays are zero-copy views; version 2 relations are expanded to
+    dense matrices and the ratios derived here.
+
+    Args:
+        source: Artifact bytes (or any buffer), or a file path to memory-map read-only
+
+    Returns:
+        Dict: Ts, Tc, synergy_matrix, counter_matrix, champions (name array),
+            champion_index (name -> row) and metadata; version 2 also has S and C
+    """
+    version, relations, metadata = unpack_arrays(source)
+
+    if version >= 2:
+        S, Ts, C, Tc = expand_relations(relations, len(relations["champions"]))
+        relations = {"champions": relations["champions"], "S": S, "Ts": Ts, "C": C, "Tc": Tc}
+        relations["synergy_matrix"] = np.divide(S, Ts, out=np.zeros(Ts.shape), where=Ts != 0)
+        relations["counter_matrix"] = np.divide(C, Tc, out=np.zeros(Tc.shape), where=Tc != 0)
+
+    relations["champion_index"] = {c: i for i, c in enumerate(relations["champions"].tolist())}
+    relations["metadata"] = metadata
+    return relations
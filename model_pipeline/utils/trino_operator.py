@@ -1,5 +1,5 @@
 import trino
-from typing import Optional, List, Dict, Any
+from typing import Optional, List, Dict, Any, Iterator
 from loguru import logger
 from settings import settings
 
@@ -33,12 +33,13 @@ class TrinoDBOperator:
             logger.error(f"Failed to connect to Trino: {e}")
             raise
 
-    def execute_query(self, query: str) -> List[Dict[str, Any]]:
+    def execute_query(self, query: str, params: Optional[tuple] = None) -> List[Dict[str, Any]]:
         """
         Execute a query and return results
 
         Args:
-            query: SQL query string
+            query: SQL query string, with ? placeholders for params
+            params: Optional bound parameters
 
         Returns:
             List of dictionaries representing query results
@@ -48,7 +49,7 @@ class TrinoDBOperator:
 
         try:
             cursor = self.connection.cursor()
-            cursor.execute(query)
+            cursor.execute(query, params)
 
             # Get column names
             columns = [desc[0] for desc in cursor.description] if cursor.description else []
@@ -69,6 +70,46 @@ class TrinoDBOperator:
             if cursor:
                 cursor.close()
 
+    def iter_query(self, query: str, batch_size: int = 10000, params: Optional[tuple] = None) -> Iterator[List[Dict[str, Any]]]:
+        """
+        Execute a query and yield results in batches, keeping memory bounded
+
+        Args:
+            query: SQL query string, with ? placeholders for params
+            batch_size: Number of rows per cursor.fetchmany call
+            params: Optional bound parameters
+
+        Yields:
+            Lists of at most batch_size dictionaries
+        """
+        if not self.connection:
+            self.connect()
+
+        cursor = None
+        try:
+            cursor = self.connection.cursor()
+            cursor.execute(query, params)
+
+            # Get column names
+            columns = [desc[0] for desc in cursor.description] if cursor.description else []
+
+            total_rows = 0
+            while True:
+                rows = cursor.fetchmany(batch_size)
+                if not rows:
+                    break
+                total_rows += len(rows)
+                yield [dict(zip(columns, row)) for row in rows]
+
+            logger.info(f"Query streamed successfully, returned {total_rows} rows")
+
+        except Exception as e:
+            logger.error(f"Query execution failed: {e}")
+            raise
+        finally:
+            if cursor:
+                cursor.close()
+
     def execute_insert(self, query: str) -> int:
         """
         Execute an insert/update/delete query
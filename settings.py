@@ -1,4 +1,6 @@
 from typing import Optional
+import importlib.util
+from pydantic import field_validator
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
 class Settings(BaseSettings):
@@ -20,6 +22,20 @@ class Settings(BaseSettings):
     S3_ACCESS_KEY: str = "admin"
     S3_SECRET_KEY: str = "admin1234"
     S3_DATA_BUCKET: str = "data-lakehouse"
+    # Process-wide keep-alive pool shared by every S3Operator
+    S3_HTTP_NUM_POOLS: int = 10
+    S3_HTTP_POOL_SIZE: int = 32
+    S3_CONNECT_TIMEOUT_SECONDS: float = 10.0
+    S3_READ_TIMEOUT_SECONDS: float = 300.0
+    # Concurrent requests of download_many/upload_many (one part each); keep within S3_HTTP_POOL_SIZE
+    S3_TRANSFER_WORKERS: int = 16
+    # Multipart uploads and ranged downloads: bytes per part and parts in flight per object
+    S3_PART_SIZE_MB: int = 16
+    S3_PART_WORKERS: int = 4
+    # Codec (gzip, zstd or empty for none) for objects only this codebase reads back:
+    # raw match JSON and model artifacts. Tables Trino scans stay uncompressed.
+    # zstd needs the zstd extra (poetry install -E zstd).
+    S3_COMPRESSION: str = "gzip"
 
     # TRINO Configuration
     TRINO_HOST: str = "localhost"
@@ -34,9 +50,40 @@ class Settings(BaseSettings):
     PLAYERS_TABLE: str = "players"
     CHAMPION_TABLE: str = "champions"
 
+    # Training
+    TRAINING_FETCH_BATCH_SIZE: int = 10000
+    TRAINING_QUERY_WORKERS: int = 4
+    TRAINING_PROCESS_WORKERS: int = 1
+    TRAINING_MAX_CONCURRENT_JOBS: int = 1
+    TRAINING_MAX_QUEUED_JOBS: int = 16
+    # Lock files serialising the read-modify-write of persisted training state between jobs on a host
+    TRAINING_STATE_LOCK_DIR: str = "/tmp/champion_training_locks"
+
+    # Serving
+    SERVING_MODEL_POLL_SECONDS: float = 30.0
+    SERVING_MODEL_MEMORY_BUDGET_MB: float = 1024.0
+    # tmpfs directory for model images memory-mapped by every API worker; empty disables sharing
+    SERVING_SHARED_MODEL_DIR: str = "/dev/shm/champion_models"
+    SERVING_CHAMPION_METADATA_TTL_SECONDS: float = 3600.0
+    SERVING_PREDICT_WORKERS: int = 4
+    SERVING_RESULT_CACHE_SIZE: int = 10000
+    SERVING_RESULT_CACHE_TTL_SECONDS: float = 600.0
+    SERVING_TEAM_BEAM_WIDTH: int = 64
+    SERVING_TEAM_TIME_BUDGET_MS: float = 250.0
+
     MLFLOW_S3_ENDPOINT_URL: str = "http://localhost:9000"
     MLFLOW_BACKEND_STORE_URI: str =  "http://localhost:5000"
 
     FASTAPI_HOST: str = "http://localhost:8000"
 
+    @field_validator("S3_COMPRESSION")
+    @classmethod
+    def check_compression(cls, codec: str) -> str:
+        """Fail at startup rather than on every upload when the codec cannot be used"""
+        if codec not in ("", "gzip", "zstd"):
+            raise ValueError(f"Unknown S3_COMPRESSION {codec!r}, expected gzip, zstd or empty")
+        if codec == "zstd" and importlib.util.find_spec("zstandard") is None:
+            raise ValueError("S3_COMPRESSION=zstd needs the zstandard package (the zstd extra)")
+        return codec
+
 settings = Settings()
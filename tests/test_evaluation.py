@@ -0,0 +1,96 @@
+import itertools
+import numpy as np
+import pytest
+from model_pipeline.training.actors import evaluation
+from model_pipeline.training.actors.evaluation import Evaluation
+
+
+def random_counts(rng, n):
+    # Sparse small counts, so some candidates tie and some drafts have none
+    Ts = rng.integers(0, 3, (n, n))
+    Tc = rng.integers(0, 3, (n, n))
+    return rng.integers(0, Ts + 1), Ts, rng.integers(0, Tc + 1), Tc
+
+
+def random_codes(rng, n, matches):
+    return np.array([rng.choice(n, 10, replace=False) for _ in range(matches)])
+
+
+def reference_evaluate(S, Ts, C, Tc, codes):
+    """One case at a time, as the notebook pipeline scored the holdout"""
+    Ts, Tc = np.asarray(Ts, dtype=float), np.asarray(Tc, dtype=float)
+    synergy = np.divide(S, Ts, out=np.zeros_like(Ts), where=Ts != 0)
+    counter = np.divide(C, Tc, out=np.zeros_like(Tc), where=Tc != 0)
+
+    def cwr(team, opponents):
+        synergy_sum = sum(synergy[a, b] for a, b in itertools.combinations(team, 2))
+        counter_sum = sum(counter[a, o] for a in team for o in opponents)
+        return (synergy_sum + counter_sum) / (len(team) * (len(team) - 1) / 2 + len(team) * len(opponents))
+
+    def recommend(allies, opponents):
+        best, best_score = None, -np.inf
+        for c in range(len(Ts)):
+            if c in allies or c in opponents:
+                continue
+            weight = sum(Ts[c, a] for a in allies) + sum(Tc[c, o] for o in opponents)
+            if weight == 0:
+                continue
+            score = (sum(synergy[c, a] * Ts[c, a] for a in allies)
+                     + sum(counter[c, o] * Tc[c, o] for o in opponents)) / weight
+            if score > best_score:
+                best, best_score = c, score
+        return best
+
+    upper_hand, pick_hits, cwr_gain = [], [], []
+    for match in codes:
+        team1, team2 = list(match[:5]), list(match[5:])
+        for team, opponents in ((team1, team2), (team2, team1)):
+            for removed in range(5):
+                allies = team[:removed] + team[removed + 1:]
+                recommended = recommend(allies, opponents)
+                if recommended is None:
+                    continue
+                with_reco = allies + [recommended]
+                upper_hand.append(int(cwr(with_reco, opponents) > cwr(opponents, with_reco)))
+                pick_hits.append(int(recommended == team[removed]))
+                cwr_gain.append(cwr(with_reco, opponents) - cwr(allies, opponents))
+    return {
+        "evaluated_picks": len(upper_hand),
+        "avg_upper_hand": np.mean(upper_hand),
+        "match_pick_accuracy": np.mean(pick_hits),
+        "avg_cwr_gain": np.mean(cwr_gain),
+    }
+
+
+@pytest.mark.parametrize("chunk_size, matches", [(7, 23), (4096, 23), (10, 5), (1, 3)])
+def test_matches_per_case_reference(monkeypatch, chunk_size, matches):
+    monkeypatch.setattr(evaluation, "EVALUATION_CHUNK_SIZE", chunk_size)
+    rng = np.random.default_rng(chunk_size + matches)
+    counts = random_counts(rng, 16)
+    codes = random_codes(rng, 16, matches)
+
+    expected = reference_evaluate(*counts, codes)
+    actual = Evaluation(*counts).evaluate(codes)
+
+    assert actual["evaluated_picks"] == expected["evaluated_picks"]
+    for metric in ("avg_upper_hand", "match_pick_accuracy", "avg_cwr_gain"):
+        assert actual[metric] == pytest.approx(expected[metric], rel=1e-12, abs=1e-12)
+
+
+def test_skips_cases_without_candidates():
+    n = 12
+    zeros = np.zeros((n, n), dtype=int)
+    codes = random_codes(np.random.default_rng(0), n, 4)
+
+    results = Evaluation(zeros, zeros, zeros, zeros).evaluate(codes)
+
+    assert results["evaluated_picks"] == 0
+    assert np.isnan(results["avg_upper_hand"])
+
+
+def test_empty_holdout():
+    counts = random_counts(np.random.default_rng(1), 12)
+
+    results = Evaluation(*counts).evaluate(np.zeros((0, 10), dtype=np.intp))
+
+    assert results["evaluated_picks"] == 0
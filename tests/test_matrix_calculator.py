@@ -0,0 +1,77 @@
+import itertools
+import numpy as np
+import pytest
+from model_pipeline.training.actors.matrix_calculator import ChampionRelations
+
+
+def random_matches(rng, n, num_champions=30):
+    names = [f"c{i:02d}" for i in range(num_champions)]
+    matches = []
+    for _ in range(n):
+        picks = rng.choice(names, 10, replace=False)
+        matches.append({
+            "team1_champions": ",".join(picks[:5]),
+            "team2_champions": ",".join(picks[5:]),
+            "team1_win": "true" if rng.random() < 0.5 else "false",
+        })
+    return matches
+
+
+def reference_counts(matches):
+    """The per-pair permutations loop the vectorized counting replaced"""
+    relations = ChampionRelations([])
+    processed = relations.process_matches(matches)
+    champions = sorted({champ for t1, t2, _ in processed for champ in t1 + t2})
+    index = {c: i for i, c in enumerate(champions)}
+    size = len(champions)
+    S, Ts, C, Tc = (np.zeros((size, size), dtype=int) for _ in range(4))
+    for team1, team2, team1_win in processed:
+        winner, loser = (team1, team2) if team1_win else (team2, team1)
+        for team in (winner, loser):
+            for ca, cb in itertools.permutations(team, 2):
+                Ts[index[ca], index[cb]] += 1
+                if team is winner:
+                    S[index[ca], index[cb]] += 1
+        for ca in winner:
+            for cb in loser:
+                C[index[ca], index[cb]] += 1
+                Tc[index[ca], index[cb]] += 1
+                Tc[index[cb], index[ca]] += 1
+    return champions, S, Ts, C, Tc
+
+
+@pytest.mark.parametrize("seed, n", [(0, 1), (1, 50), (2, 400)])
+def test_counts_match_permutations_loop(seed, n):
+    matches = random_matches(np.random.default_rng(seed), n)
+    champions, *expected = reference_counts(matches)
+
+    relations = ChampionRelations(matches)
+    synergy, counter = relations.calculate()
+
+    assert relations.champions == champions
+    for actual, reference in zip(relations.get_counts(), expected):
+        np.testing.assert_array_equal(actual, reference)
+    S, Ts, C, Tc = expected
+    np.testing.assert_array_equal(synergy, np.divide(S, Ts, out=np.zeros(S.shape), where=Ts != 0))
+    np.testing.assert_array_equal(counter, np.divide(C, Tc, out=np.zeros(C.shape), where=Tc != 0))
+    assert relations.get_num_matches() == n
+    assert relations.get_match_weight() == n
+
+
+def test_counter_total_is_wins_plus_losses():
+    relations = ChampionRelations(random_matches(np.random.default_rng(3), 200))
+    relations.count()
+
+    np.testing.assert_array_equal(relations.Tc, relations.C + relations.C.T)
+    np.testing.assert_array_equal(relations.Tc, relations.Tc.T)
+
+
+def test_batches_sum_to_one_count():
+    matches = random_matches(np.random.default_rng(4), 300)
+    whole = ChampionRelations(matches)
+    whole.count()
+
+    batched = ChampionRelations.from_batches([matches[:70], matches[70:71], matches[71:]])
+
+    assert batched.champions == whole.champions
+    np.testing.assert_array_equal(batched.get_counts(), whole.get_counts())
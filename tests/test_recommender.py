@@ -0,0 +1,88 @@
+import numpy as np
+import pandas as pd
+import pytest
+from model_pipeline.serving.actors.recommender import ChampionRecommender
+
+
+@pytest.fixture(scope="module")
+def recommender():
+    rng = np.random.default_rng(11)
+    n = 25
+    # Small integer counts, so many candidates tie exactly and some have no shared games
+    Ts = rng.integers(0, 4, (n, n))
+    Tc = rng.integers(0, 4, (n, n))
+    S = rng.integers(0, Ts + 1)
+    C = rng.integers(0, Tc + 1)
+    synergy = np.divide(S, Ts, out=np.zeros((n, n)), where=Ts != 0)
+    counter = np.divide(C, Tc, out=np.zeros((n, n)), where=Tc != 0)
+    return ChampionRecommender({
+        "S": S, "Ts": Ts, "C": C, "Tc": Tc,
+        "synergy_matrix": synergy,
+        "counter_matrix": counter,
+        "champion_index": {f"c{i:02d}": i for i in range(n)},
+    })
+
+
+def reference_ranking(recommender, allies, opponents, bans):
+    """The per-champion DataFrame path the vectorized scoring replaced"""
+    idx = recommender.champion_index
+    S = recommender.synergy_wins_t[:-1, :-1].T
+    C = recommender.counter_wins_t[:-1, :-1].T
+    Ts, Tc = recommender.Ts, recommender.Tc
+    results = []
+    for c in idx:
+        if c in allies or c in opponents or c in bans:
+            continue
+        i = idx[c]
+        total_weight = sum(Ts[i][idx[a]] for a in allies) + sum(Tc[i][idx[o]] for o in opponents)
+        if total_weight == 0:
+            continue
+        wins = sum(S[i][idx[a]] for a in allies) + sum(C[i][idx[o]] for o in opponents)
+        results.append((c, wins / total_weight))
+    results.sort(key=lambda x: x[1], reverse=True)
+    return pd.DataFrame(results, columns=["champion", "score"])
+
+
+def random_drafts(recommender, count, seed):
+    rng = np.random.default_rng(seed)
+    names = list(recommender.champion_index)
+    drafts = []
+    for _ in range(count):
+        picked = rng.choice(names, rng.integers(1, 11), replace=False).tolist()
+        split = rng.integers(0, min(len(picked), 5) + 1)
+        bans = rng.choice(names, rng.integers(0, 6), replace=False).tolist() + ["not_a_champion"]
+        drafts.append((picked[:split], picked[split:], bans))
+    return drafts
+
+
+@pytest.mark.parametrize("top_n", [None, 0, 1, 3, 7, 100])
+def test_rankings_match_dataframe_path(recommender, top_n):
+    for allies, opponents, bans in random_drafts(recommender, 60, seed=top_n or 0):
+        expected = reference_ranking(recommender, allies, opponents, bans)
+        if top_n is not None:
+            expected = expected.head(top_n)
+
+        actual = recommender.recommend_weighted(allies, opponents, bans, top_n=top_n)
+
+        assert actual["champion"].tolist() == expected["champion"].tolist()
+        np.testing.assert_array_equal(actual["score"].to_numpy(), expected["score"].to_numpy())
+        assert not set(actual["champion"]) & set(allies + opponents + bans)
+
+
+def test_top_k_breaks_ties_by_champion_index():
+    scores = np.array([0.5, -np.inf, 0.7, 0.5, 0.7, 0.5, 0.1, 0.5])
+
+    assert ChampionRecommender.top_k(scores).tolist() == [2, 4, 0, 3, 5, 7, 6]
+    assert ChampionRecommender.top_k(scores, 3).tolist() == [2, 4, 0]
+    assert ChampionRecommender.top_k(scores, 4).tolist() == [2, 4, 0, 3]
+    assert ChampionRecommender.top_k(scores, 0).tolist() == []
+
+
+def test_score_batch_matches_score(recommender):
+    drafts = random_drafts(recommender, 40, seed=5)
+    allies, opponents, bans = (list(part) for part in zip(*drafts))
+
+    batch = recommender.score_batch(allies, opponents, bans)
+
+    for row, draft in zip(batch, drafts):
+        np.testing.assert_array_equal(row, recommender.score(*draft))
@@ -0,0 +1,74 @@
+import itertools
+import numpy as np
+import pytest
+from model_pipeline.serving.actors.champion_metadata import ChampionMetadata, VALID_POSITIONS
+from model_pipeline.serving.actors.recommender import ChampionRecommender
+from model_pipeline.serving.actors.team_completion import TeamCompleter
+
+
+@pytest.fixture(scope="module")
+def draft():
+    rng = np.random.default_rng(7)
+    n = 40
+    Ts = np.triu(rng.integers(1, 50, (n, n)), 1)
+    Ts = Ts + Ts.T
+    Tc = rng.integers(1, 30, (n, n))
+    synergy = np.triu(rng.random((n, n)), 1)
+    names = [f"c{i:02d}" for i in range(n)]
+    recommender = ChampionRecommender({
+        "Ts": Ts,
+        "Tc": Tc,
+        "synergy_matrix": synergy + synergy.T,
+        "counter_matrix": rng.random((n, n)),
+        "champion_index": {name: i for i, name in enumerate(names)},
+    })
+    rows = [
+        {"champion_name": name, "roles": f"{VALID_POSITIONS[i % 5]},{VALID_POSITIONS[(i + 2) % 5]}", "icon_url": None}
+        for i, name in enumerate(names)
+    ]
+    return recommender, ChampionMetadata(rows), names
+
+
+def brute_force(recommender, metadata, allies, opponents, bans, positions, top_k):
+    index = recommender.champion_index
+    ally_idx = [index[a] for a in allies]
+    opponent_idx = [index[o] for o in opponents]
+    excluded = set(ally_idx) | set(opponent_idx) | {index[b] for b in bans}
+    pools = [
+        [i for i, name in enumerate(recommender.champions) if pos in metadata.roles(name) and i not in excluded]
+        for pos in positions
+    ]
+    synergy, counter = recommender.synergy_matrix, recommender.counter_matrix
+    scores = {}
+    for picks in itertools.product(*pools):
+        team = ally_idx + list(picks)
+        if len(set(team)) < len(team) or frozenset(picks) in scores:
+            continue
+        total = sum(synergy[a, b] for a, b in itertools.combinations(team, 2)) \
+            + sum(counter[a, o] for a in team for o in opponent_idx)
+        scores[frozenset(picks)] = total / (len(team) * (len(team) - 1) / 2 + len(team) * len(opponent_idx))
+    return sorted(scores.values(), reverse=True)[:top_k]
+
+
+@pytest.mark.parametrize("positions", [["TOP", "JUNGLE"], ["TOP", "MIDDLE", "SUPPORT"]])
+def test_complete_matches_brute_force(draft, positions):
+    recommender, metadata, names = draft
+    allies, opponents, bans = names[:2], names[10:14], names[20:23]
+    completer = TeamCompleter(recommender, metadata, beam_width=10 ** 6, time_budget_ms=1e6)
+
+    result = completer.complete(allies, opponents, bans, positions, top_k=5)
+
+    assert not result["truncated"]
+    assert [c["cwr"] for c in result["completions"]] == pytest.approx(
+        brute_force(recommender, metadata, allies, opponents, bans, positions, 5)
+    )
+
+
+def test_complete_out_of_budget_still_returns_completions(draft):
+    recommender, metadata, names = draft
+    completer = TeamCompleter(recommender, metadata, beam_width=10 ** 6, time_budget_ms=0.0)
+
+    result = completer.complete(names[:1], names[10:14], [], ["TOP", "JUNGLE", "MIDDLE", "SUPPORT"], top_k=3)
+
+    assert result["truncated"]
+    assert len(result["completions"]) == 3